@@ -4,15 +4,22 @@ A local web app that scans your ebook library, extracts ISBNs,
 queries OpenLibrary/Google Books, and stores authoritative metadata in SQLite.
 """
 
+import io
 import os
 import re
 import json
+import mmap
+import zlib
+import operator
+import hashlib
 import sqlite3
 import zipfile
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, g
+from flask import Flask, render_template, request, jsonify, g, Response
 
 # ─── Optional PDF support ───────────────────────────────────────────────────
 try:
@@ -25,20 +32,79 @@ except ImportError:
         PDF_SUPPORT = "pdfminer"
     except ImportError:
         PDF_SUPPORT = False
+# MuPDF is not thread-safe — serialize fitz calls from scan worker threads
+_PDF_LOCK = threading.Lock()
+
+# ─── Optional lxml (fast HTML stripping) ─────────────────────────────────────
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# ─── Optional pyahocorasick (fast LC class prefix scan) ──────────────────────
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# ─── Optional zstandard (text_cache compression) ─────────────────────────────
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# ─── Optional orjson (fast JSON for API responses and the cache) ─────────────
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # ─── Optional HTTP ───────────────────────────────────────────────────────────
 try:
     import urllib.request
     import urllib.parse
     import urllib.error
+    import http.client
     HTTP_AVAILABLE = True
 except ImportError:
     HTTP_AVAILABLE = False
 
+# ─── Optional urllib3 (pooled keep-alive HTTP) ───────────────────────────────
+try:
+    import urllib3
+    URLLIB3_AVAILABLE = True
+except ImportError:
+    URLLIB3_AVAILABLE = False
+
+# ─── Optional send2trash (in-process Recycle Bin / Trash) ────────────────────
+try:
+    from send2trash import send2trash
+    SEND2TRASH_AVAILABLE = True
+except ImportError:
+    SEND2TRASH_AVAILABLE = False
+
 app = Flask(__name__)
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "books.db")
+CACHE_TTL = 30 * 24 * 60 * 60  # api_cache entry lifetime, seconds
 SCAN_STATUS = {"running": False, "progress": 0, "total": 0, "current": "", "done": False}
+# Worker threads for per-file hashing/extraction during a scan (I/O + zlib release the GIL)
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 2)
+# Books looked up concurrently in Phase 2 (network-bound; keeps per-host load modest)
+ENRICH_WORKERS = 8
+# Phase 2 and the LC batch job write this many books per transaction
+# (or every SCAN_BATCH_SECS)
+ENRICH_BATCH_BOOKS = 50
+# Phase 1 commits after this many buffered book_files rows, or this many seconds —
+# whichever comes first, so UI writers never wait out busy_timeout behind a scan
+SCAN_BATCH_ROWS = 2000
+SCAN_BATCH_SECS = 5
+# WAL pages the scan writer may accumulate before SQLite checkpoints (default 1000)
+SCAN_WAL_AUTOCHECKPOINT = 10000
 
 SUPPORTED_EXTENSIONS = {".epub", ".pdf", ".mobi", ".azw", ".azw3", ".djvu", ".tif", ".tiff", ".cbz", ".cbr"}
 AUDIO_EXTENSIONS    = {".mp3", ".m4a", ".m4b", ".aac", ".ogg", ".flac", ".opus", ".wma", ".wav"}
@@ -49,21 +115,166 @@ IGNORE_EXTENSIONS   = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp',
 
 # ─── Database ────────────────────────────────────────────────────────────────
 
+# Applied on top of WAL: fsync only at checkpoints, temp B-trees in RAM,
+# mmap'd page reads and a 64MB page cache.
+_CONN_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL; PRAGMA temp_store=MEMORY; "
+    "PRAGMA mmap_size=268435456; PRAGMA cache_size=-65536;"
+)
+# Seconds a connection waits on a locked database before "database is locked".
+# sqlite3.connect(timeout=) is SQLite's busy_timeout, so this is its only setting.
+DB_TIMEOUT = 15
+
+_DB_URI_RO = Path(DB_PATH).resolve().as_uri() + "?mode=ro"
+
+def _apply_pragmas(conn, readonly=False):
+    """Switch a fresh connection to WAL (unless read-only) and apply _CONN_PRAGMAS."""
+    if not readonly:
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_CONN_PRAGMAS)
+    return conn
+
+def get_db_ro(timeout=DB_TIMEOUT, **kwargs):
+    """
+    New read-only connection with Row results. Reads never take part in WAL
+    writer locking, so long scans (export, the LC batch job's work list) do
+    not hold up the scanner's writes. The caller closes it.
+    """
+    conn = _apply_pragmas(sqlite3.connect(_DB_URI_RO, uri=True, timeout=timeout, **kwargs),
+                          readonly=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+# Idle read-only connections for GET requests. Each request runs on a fresh
+# thread, so reusing connections is what lets sqlite3's per-connection
+# statement cache (and the pragma setup) carry over from one page to the next.
+_RO_POOL = []
+_RO_POOL_LOCK = threading.Lock()
+_RO_POOL_SIZE = 8
+
 def get_db():
+    """
+    Per-request connection. GET handlers only read, so they get a read-only
+    one from get_db_ro(). Writers open their transaction with BEGIN IMMEDIATE,
+    so the write lock is waited for under busy_timeout up front instead of
+    failing "database is locked" when a read-then-write has to upgrade.
+    """
     if "db" not in g:
-        g.db = sqlite3.connect(DB_PATH, timeout=15)
-        g.db.row_factory = sqlite3.Row
-        g.db.execute("PRAGMA journal_mode=WAL")
+        if request.method == 'GET':
+            with _RO_POOL_LOCK:
+                conn = _RO_POOL.pop() if _RO_POOL else None
+            g.db = conn or get_db_ro(check_same_thread=False, cached_statements=256)
+            g.db_pooled = True
+        else:
+            g.db = _apply_pragmas(sqlite3.connect(DB_PATH, timeout=DB_TIMEOUT,
+                                                  isolation_level="IMMEDIATE"))
+            g.db.row_factory = sqlite3.Row
     return g.db
 
+# Single long-lived writer for background jobs (scanner). Implicit transactions
+# open with BEGIN IMMEDIATE so a batch never has to upgrade its lock mid-way.
+_WRITE_DB = None
+_WRITE_LOCK = threading.Lock()
+
+@contextmanager
+def write_db():
+    """
+    Borrow the shared writer connection. Holds _WRITE_LOCK for the block,
+    commits on a clean exit and rolls back on error.
+    """
+    global _WRITE_DB
+    with _WRITE_LOCK:
+        if _WRITE_DB is None:
+            _WRITE_DB = sqlite3.connect(DB_PATH, timeout=DB_TIMEOUT, check_same_thread=False,
+                                        isolation_level="IMMEDIATE")
+            _WRITE_DB.row_factory = sqlite3.Row
+            _apply_pragmas(_WRITE_DB)
+            # Scans commit in bursts; let the WAL grow and checkpoint once at the end
+            _WRITE_DB.execute(f"PRAGMA wal_autocheckpoint={SCAN_WAL_AUTOCHECKPOINT}")
+        try:
+            yield _WRITE_DB
+            _WRITE_DB.commit()
+        except BaseException:
+            _WRITE_DB.rollback()
+            raise
+
+def _retry_locked(fn, retries=5, delay=0.2):
+    """
+    Call fn() — typically a whole write_db() block — again with exponential
+    backoff if SQLite still reports the database locked/busy after busy_timeout.
+    write_db() has rolled back by then, so the retry replays the full batch.
+    """
+    for attempt in range(retries):
+        try:
+            return fn()
+        except sqlite3.OperationalError as e:
+            msg = str(e)
+            if attempt == retries - 1 or ('locked' not in msg and 'busy' not in msg):
+                raise
+            time.sleep(delay * 2 ** attempt)
+
+def finalize_scan():
+    """Fold the scan's WAL back into the database and truncate it to zero bytes."""
+    with write_db() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
 @app.teardown_appcontext
 def close_db(e=None):
     db = g.pop("db", None)
+    if db and g.pop("db_pooled", False):
+        with _RO_POOL_LOCK:
+            if len(_RO_POOL) < _RO_POOL_SIZE:
+                _RO_POOL.append(db)
+                return
     if db:
         db.close()
 
+# Full-text index behind the book list search. The trigram tokenizer gives the
+# same case-insensitive substring matches as LIKE '%q%' (for queries of three
+# or more characters) from an index. Triggers keep it in step with books and
+# book_files; file_names holds a book's file names, one per line.
+_FTS_COLS = 'title, author, isbn13, subjects, lc_call_number, file_names'
+_FTS_FILE_NAMES = "(SELECT GROUP_CONCAT(file_name, char(10)) FROM book_files WHERE book_id={})"
+_FTS_TRIGGERS = {
+    'books_fts_ai': f"""
+        CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts(rowid, {_FTS_COLS}) VALUES (new.id, new.title, new.author,
+                new.isbn13, new.subjects, new.lc_call_number, {_FTS_FILE_NAMES.format('new.id')});
+        END""",
+    'books_fts_au': """
+        CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author, isbn13, subjects, lc_call_number ON books BEGIN
+            UPDATE books_fts SET title=new.title, author=new.author, isbn13=new.isbn13,
+                subjects=new.subjects, lc_call_number=new.lc_call_number WHERE rowid=new.id;
+        END""",
+    'books_fts_ad': """
+        CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN
+            DELETE FROM books_fts WHERE rowid=old.id;
+        END""",
+    'book_files_fts_ai': f"""
+        CREATE TRIGGER book_files_fts_ai AFTER INSERT ON book_files BEGIN
+            UPDATE books_fts SET file_names={_FTS_FILE_NAMES.format('new.book_id')} WHERE rowid=new.book_id;
+        END""",
+    'book_files_fts_au': f"""
+        CREATE TRIGGER book_files_fts_au AFTER UPDATE OF book_id, file_name ON book_files BEGIN
+            UPDATE books_fts SET file_names={_FTS_FILE_NAMES.format('old.book_id')} WHERE rowid=old.book_id;
+            UPDATE books_fts SET file_names={_FTS_FILE_NAMES.format('new.book_id')} WHERE rowid=new.book_id;
+        END""",
+    'book_files_fts_ad': f"""
+        CREATE TRIGGER book_files_fts_ad AFTER DELETE ON book_files BEGIN
+            UPDATE books_fts SET file_names={_FTS_FILE_NAMES.format('old.book_id')} WHERE rowid=old.book_id;
+        END""",
+}
+# Set by init_db(); False when this SQLite has no FTS5 trigram tokenizer
+FTS_AVAILABLE = False
+
+# Stored in PRAGMA user_version once init_db has brought a database up to date.
+# Bump it with each new migration so steady-state startups skip the checks.
+_SCHEMA_VERSION = 4
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH, timeout=15)
+    global FTS_AVAILABLE
+    conn = _apply_pragmas(sqlite3.connect(DB_PATH, timeout=DB_TIMEOUT))
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
     # Create tables if they don't exist
     conn.execute("""
         CREATE TABLE IF NOT EXISTS books (
@@ -132,45 +343,146 @@ def init_db():
     """)
     conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_book_files_path ON book_files(file_path)")
     conn.execute("CREATE INDEX IF NOT EXISTS idx_book_files_book ON book_files(book_id)")
-
-    # API response cache — keyed by (source, query), TTL 30 days
+    # Detail view and re-enrichment fetch/clear candidates per book
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_match_candidates_book ON match_candidates(book_id)")
+
+    # Migrate: older api_cache tables were keyed on the query text itself —
+    # either a rowid table with UNIQUE(source, query) and a lookup index, or
+    # WITHOUT ROWID on (source, query). Rebuild keyed on a 16-byte query hash,
+    # carrying expiry forward (from cached_at on the oldest layout).
+    cache_cols = set()
+    if version < 1:
+        cache_cols = {row[1] for row in conn.execute("PRAGMA table_info(api_cache)").fetchall()}
+    migrate_cache = bool(cache_cols) and 'query_hash' not in cache_cols
+    if migrate_cache:
+        conn.execute("ALTER TABLE api_cache RENAME TO api_cache_old")
+        conn.execute("DROP INDEX IF EXISTS idx_api_cache_lookup")
+        conn.execute("DROP INDEX IF EXISTS idx_api_cache_expires")
+
+    # API response cache — keyed by (source, hash of query), TTL 30 days.
+    # query is kept for inspection only.
     conn.execute("""
         CREATE TABLE IF NOT EXISTS api_cache (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
             source TEXT NOT NULL,
-            query TEXT NOT NULL,
+            query_hash BLOB NOT NULL,
+            query TEXT,
             response_json TEXT,
             cached_at TEXT DEFAULT (datetime('now')),
-            UNIQUE(source, query)
-        )
+            expires_at INTEGER,
+            etag TEXT,
+            last_modified TEXT,
+            PRIMARY KEY (source, query_hash)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_api_cache_expires ON api_cache(expires_at)")
+    if migrate_cache:
+        conn.create_function("cache_key", 1, _cache_key)
+        expires = ("expires_at" if 'expires_at' in cache_cols
+                   else f"CAST(strftime('%s', cached_at) AS INTEGER) + {CACHE_TTL}")
+        conn.execute(f"""
+            INSERT OR REPLACE INTO api_cache
+                (source, query_hash, query, response_json, cached_at, expires_at)
+            SELECT source, cache_key(query), query, response_json, cached_at, {expires}
+            FROM api_cache_old
+        """)
+        conn.execute("DROP TABLE api_cache_old")
+    # Extracted file text keyed by content hash, so re-added or duplicate
+    # files skip decompression and text extraction
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS text_cache (
+            file_sha1 TEXT PRIMARY KEY,
+            extracted_text BLOB,
+            extracted_at TEXT DEFAULT (datetime('now'))
+        ) WITHOUT ROWID
     """)
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_api_cache_lookup ON api_cache(source, query)")
+    # Migrate: HTTP validators for conditional re-fetch of expired entries
+    if version < 2:
+        cache_cols = {row[1] for row in conn.execute("PRAGMA table_info(api_cache)").fetchall()}
+        for col in ("etag", "last_modified"):
+            if col not in cache_cols:
+                conn.execute(f"ALTER TABLE api_cache ADD COLUMN {col} TEXT")
+    # Sweep expired entries — indexed range deletes on expires_at. Entries with
+    # an ETag/Last-Modified get one more TTL to be revalidated with a cheap 304.
+    now = "CAST(strftime('%s', 'now') AS INTEGER)"
+    conn.execute(f"DELETE FROM api_cache WHERE expires_at <= {now} "
+                 "AND etag IS NULL AND last_modified IS NULL")
+    conn.execute(f"DELETE FROM api_cache WHERE expires_at <= {now} - {CACHE_TTL}")
 
     # Migrate: add any columns that may be missing from older DB versions
-    existing_cols = {row[1] for row in conn.execute("PRAGMA table_info(books)").fetchall()}
-    migrations = [
-        ("date_added",       "TEXT DEFAULT (datetime('now'))"),
-        ("date_updated",     "TEXT DEFAULT (datetime('now'))"),
-        ("lc_call_number",   "TEXT"),
-        ("subtitle",         "TEXT"),
-        ("language",         "TEXT"),
-        ("page_count",       "INTEGER"),
-        ("match_confidence", "TEXT DEFAULT 'none'"),
-        ("manual_override",  "INTEGER DEFAULT 0"),
-        ("notes",            "TEXT"),
-        ("primary_file_path", "TEXT"),
-        ("lc_class",         "TEXT"),
-        ("lc_number",        "TEXT"),
-        ("lc_cutter",        "TEXT"),
-        ("lc_year",          "TEXT"),
-        ("lc_sort",          "TEXT"),
-        ("is_physical",      "INTEGER DEFAULT 0"),
-        ("date_read",        "TEXT"),
-        ("rating",           "INTEGER"),
-    ]
-    for col, col_def in migrations:
-        if col not in existing_cols:
-            conn.execute(f"ALTER TABLE books ADD COLUMN {col} {col_def}")
+    if version < 1:
+        existing_cols = {row[1] for row in conn.execute("PRAGMA table_info(books)").fetchall()}
+        migrations = [
+            ("date_added",       "TEXT DEFAULT (datetime('now'))"),
+            ("date_updated",     "TEXT DEFAULT (datetime('now'))"),
+            ("lc_call_number",   "TEXT"),
+            ("subtitle",         "TEXT"),
+            ("language",         "TEXT"),
+            ("page_count",       "INTEGER"),
+            ("match_confidence", "TEXT DEFAULT 'none'"),
+            ("manual_override",  "INTEGER DEFAULT 0"),
+            ("notes",            "TEXT"),
+            ("primary_file_path", "TEXT"),
+            ("lc_class",         "TEXT"),
+            ("lc_number",        "TEXT"),
+            ("lc_cutter",        "TEXT"),
+            ("lc_year",          "TEXT"),
+            ("lc_sort",          "TEXT"),
+            ("is_physical",      "INTEGER DEFAULT 0"),
+            ("date_read",        "TEXT"),
+            ("rating",           "INTEGER"),
+        ]
+        for col, col_def in migrations:
+            if col not in existing_cols:
+                conn.execute(f"ALTER TABLE books ADD COLUMN {col} {col_def}")
+
+    # Partial indexes stay small by skipping rows the queries never ask for:
+    # isbn13 lookups (duplicate-format/merge checks, both on file-backed books
+    # only), the unmatched count, and the shelf-order sort expression used by
+    # /api/books?sort=lc. The book list also seeks LC ranges by class and
+    # number, and pages the default newest-first order off date_added (with
+    # NULLs folded to '' so keyset cursors can reach them); status filters and
+    # the /api/stats counts use match_status.
+    if version < 3:
+        # Superseded by idx_books_isbn13_phys, which also settles is_physical=0
+        conn.execute("DROP INDEX IF EXISTS idx_books_isbn13")
+    if version < 4:
+        # Was on the bare column, which the NULL-safe sort can't use
+        conn.execute("DROP INDEX IF EXISTS idx_books_date_added")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_isbn13_phys ON books(isbn13) WHERE is_physical=0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_unmatched ON books(isbn13) WHERE match_status='unmatched'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_lc_sort ON books(COALESCE(lc_sort, 'ZZZZZZ'))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_lc_class ON books(lc_class, lc_number)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_date_added ON books(COALESCE(date_added, ''))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_match_status ON books(match_status)")
+
+    # The search index is (re)built whenever any of its triggers is missing:
+    # on first run, and after a session on a SQLite without FTS5, which has
+    # to drop the triggers because every write to books would fail on them
+    triggers = {r[0] for r in conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type='trigger' AND name IN ({','.join('?' * len(_FTS_TRIGGERS))})",
+        list(_FTS_TRIGGERS))}
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5({_FTS_COLS}, tokenize='trigram')")
+        conn.execute("SELECT 1 FROM books_fts LIMIT 0")
+        if len(triggers) < len(_FTS_TRIGGERS):
+            conn.execute("DELETE FROM books_fts")
+            conn.execute(f"""
+                INSERT INTO books_fts(rowid, {_FTS_COLS})
+                SELECT b.id, b.title, b.author, b.isbn13, b.subjects, b.lc_call_number,
+                       {_FTS_FILE_NAMES.format('b.id')}
+                FROM books b
+            """)
+            for name, sql in _FTS_TRIGGERS.items():
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                conn.execute(sql)
+        FTS_AVAILABLE = True
+    except sqlite3.OperationalError:
+        for name in _FTS_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        FTS_AVAILABLE = False
+
+    if version < _SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
     conn.commit()
     conn.close()
 
@@ -200,26 +512,47 @@ _BARE_ISBN13S_RE = re.compile(r'(?<![\d])(97[89][\d\u2010\u2011\u2012\u2013\u201
 def clean_isbn(raw):
     return re.sub(r'[^0-9Xx]', '', raw)
 
+# Byte → digit value for check-digit sums: '0'-'9' → 0-9, 'X'/'x' → 10, else 255.
+# bytes.translate plus C-level sum() avoids an int() call per character.
+_ISBN_VALUES = bytearray(b'\xff' * 256)
+_ISBN_VALUES[ord('0'):ord('9') + 1] = range(10)
+_ISBN_VALUES[ord('X')] = _ISBN_VALUES[ord('x')] = 10
+_ISBN_VALUES = bytes(_ISBN_VALUES)
+_ISBN10_WEIGHTS = range(10, 0, -1)
+
+def _isbn_values(s):
+    return s.encode('ascii', 'replace').translate(_ISBN_VALUES)
+
+def _isbn13_total(v):
+    """Weighted 1-3-1-3 sum over digit values v."""
+    return sum(v[0::2]) + 3 * sum(v[1::2])
+
+def _isbn10_total(s):
+    """Weighted 10..1 sum over s (X counts as 10), or -1 if s has a non-digit."""
+    v = _isbn_values(s)
+    if 255 in v:
+        return -1
+    return sum(map(operator.mul, _ISBN10_WEIGHTS, v))
+
 def validate_isbn13(s):
-    if len(s) != 13 or not s.isdigit():
+    if len(s) != 13:
         return False
-    total = sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(s))
-    return total % 10 == 0
+    v = _isbn_values(s)
+    return max(v) <= 9 and _isbn13_total(v) % 10 == 0
 
 def validate_isbn10(s):
     if len(s) != 10:
         return False
-    try:
-        weights = list(range(10, 0, -1))
-        total = sum(weights[i] * (10 if c.upper() == 'X' else int(c)) for i, c in enumerate(s))
-        return total % 11 == 0
-    except ValueError:
-        return False
+    total = _isbn10_total(s)
+    return total >= 0 and total % 11 == 0
 
 def isbn10_to_13(s):
     core = s[:9]
     raw = "978" + core
-    check = (10 - sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(raw)) % 10) % 10
+    v = _isbn_values(raw)
+    if max(v) > 9:
+        raise ValueError(f"invalid ISBN-10 core: {core!r}")
+    check = (10 - _isbn13_total(v) % 10) % 10
     return raw + str(check)
 
 def best_isbn(candidates):
@@ -237,73 +570,118 @@ def best_isbn(candidates):
         return seen10[0], isbn10_to_13(seen10[0])
     return None, None
 
+# OCR-fix patterns, compiled once — _fix_ocr_isbn runs on every extracted text buffer
+_DASH_CHARS = r'[\-\u2010\u2011\u2012\u2013\u2014\u2015]'
+_OCR_LABEL_CYR_RE   = re.compile(r'\bIS[Bв][NnИ]\b', re.IGNORECASE)   # ISвN variants
+_OCR_LABEL_R_RE     = re.compile(r'\bIS[Rr][NnИ]\b', re.IGNORECASE)   # ISRN
+_OCR_LABEL_DIGIT_RE = re.compile(r'\b[Ii1][Ss5][Bb8][Nn]\b')          # l5BN, 1SBN etc.
+_OCR_LEAD_GLYPH_RE  = re.compile(
+    r'(ISBN\s*[:\-\u2010\u2011\u2012\u2013\u2014\u2015]?\s*)([^\x00-\x7F])(?=[0-9OoIil\-\u2010\u2011\u2012\u2013\u2014\u2015 ])',
+    re.IGNORECASE
+)
+_DASH_COLLAPSE_RE = re.compile(
+    r'(?<=[0-9OoIilSBZzGqQ])(' + _DASH_CHARS + r'){2,}(?=[0-9OoIilSBZzGqQ])'
+)
+_OCR_LABELLED_RUN_RE = re.compile(
+    r'(ISBN[\-\u2010\u2011\u2012\u2013\u2014\u2015 ]?(?:1[03])?[\-\u2010\u2011\u2012\u2013\u2014\u2015 ]?:?\s*)([0-9OoIilSBZzGqQ][0-9OoIilSBZzGqQ \-\u2010\u2011\u2012\u2013\u2014\u2015]{8,17}[0-9OoIilXx])',
+    re.IGNORECASE
+)
+_OCR_EAN_RUN_RE = re.compile(
+    r'(97[89Bz])([0-9OoIilSBZzGqQ \-\u2010\u2011\u2012\u2013\u2014\u2015]{10,16})',
+    re.IGNORECASE
+)
+_OCR_BARE_O_RE = re.compile(r'(?<!\w)O(?=[-\s]?[0-9])')
+_OCR_BARE_I_RE = re.compile(r'(?<!\w)I(?=[-\s]?[0-9])')
+_OCR_BARE_L_RE = re.compile(r'(?<!\w)l(?=[-\s]?[0-9])')
+
+# Cheap pre-check: anything one of the substitutions above could act on.
+# Text that fails this (most MOBI byte-scan noise) is returned untouched.
+_ISBN_FAST_GATE = re.compile(
+    r'[Ii1][Ss5][Bb8вRr][NnИ]'                   # ISBN label or a corruption of it
+    r'|97[89Bz]'                                  # EAN prefix
+    r'|(?<!\w)[OIl][-\s]?[0-9]'                   # bare O-671-42517-X style ISBN-10
+    r'|[0-9OoIilSBZzGqQ]' + _DASH_CHARS + r'{2}',  # doubled separator in a digit run
+    re.IGNORECASE
+)
+
+# Character-level substitutions that are only valid in digit positions
+_OCR_DIGIT_TRANS = str.maketrans({
+    'O': '0', 'o': '0',   # O/o -> 0
+    'I': '1', 'l': '1',   # I/l -> 1 (most common)
+    'S': '5',             # S -> 5
+    'B': '8',             # B -> 8 (978 prefix)
+    'Z': '2', 'z': '2',   # Z/z -> 2
+    'G': '6',             # G -> 6
+    'q': '9', 'Q': '9',   # q/Q -> 9
+})
+
+def _clean_digit_run(m):
+    prefix = m.group(1)   # "ISBN " or "978" etc.
+    digits = m.group(2)   # the digit string that may have OCR errors
+    return prefix + digits.translate(_OCR_DIGIT_TRANS)
+
+# Context kept either side of each gate hit. Every substitution match contains
+# a gate hit and spans well under this (barring 150+ char whitespace runs).
+_OCR_WINDOW = 200
+
 def _fix_ocr_isbn(text):
     """
     Fix common OCR misreads in ISBN strings before regex matching.
     Only applies substitutions within plausible ISBN context to avoid
     corrupting non-ISBN text.
     """
+    windows = []
+    for m in _ISBN_FAST_GATE.finditer(text):
+        start = max(0, m.start() - _OCR_WINDOW)
+        # Cut just after a space/newline so \b and (?<!\w) see the same
+        # context at the window edge as they would in the full text
+        start = max(text.rfind(' ', 0, start), text.rfind('\n', 0, start)) + 1
+        end = m.end() + _OCR_WINDOW
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    if not windows:
+        return text
+
+    parts, pos = [], 0
+    for start, end in windows:
+        parts.append(text[pos:start])
+        parts.append(_fix_ocr_window(text[start:end]))
+        pos = end
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+def _fix_ocr_window(text):
+    """Run the OCR substitutions over one window of text around gate hits."""
     # Pre-pass 1: fix corrupted ISBN label spellings
     # "isвn", "ISRN", "ISвN" etc. — single-char corruption of "ISBN"
-    text = re.sub(r'\bIS[Bв][NnИ]\b', 'ISBN', text, flags=re.IGNORECASE)   # ISвN variants
-    text = re.sub(r'\bIS[Rr][NnИ]\b', 'ISBN', text, flags=re.IGNORECASE)    # ISRN
-    text = re.sub(r'\b[Ii1][Ss5][Bb8][Nn]\b', 'ISBN', text)                  # l5BN, 1SBN etc.
+    text = _OCR_LABEL_CYR_RE.sub('ISBN', text)
+    text = _OCR_LABEL_R_RE.sub('ISBN', text)
+    text = _OCR_LABEL_DIGIT_RE.sub('ISBN', text)
 
     # Pre-pass 2: replace non-ASCII non-alphanumeric characters that appear
     # immediately between "ISBN" and the digit string with '0'.
     # This handles OCR artifacts like ○, °, ©, •, Ø appearing as the first digit.
     # Pattern: ISBN <whitespace> <non-ASCII-non-digit> <digit-or-lookalike>
-    text = re.sub(
-        r'(ISBN\s*[:\-\u2010\u2011\u2012\u2013\u2014\u2015]?\s*)([^\x00-\x7F])(?=[0-9OoIil\-\u2010\u2011\u2012\u2013\u2014\u2015 ])',
-        lambda m: m.group(1) + '0',
-        text, flags=re.IGNORECASE
-    )
+    text = _OCR_LEAD_GLYPH_RE.sub(lambda m: m.group(1) + '0', text)
 
     # Pre-pass 3: collapse consecutive dashes/separators within ISBN digit runs.
     # "o-8o7o--1528-8" → "o-8o7o-1528-8"  (double dash is OCR artifact for em-dash)
     # Only collapse when surrounded by digit-like characters to avoid false positives.
-    _DASH_CHARS = r'[\-\u2010\u2011\u2012\u2013\u2014\u2015]'
-    text = re.sub(
-        r'(?<=[0-9OoIilSBZzGqQ])(' + _DASH_CHARS + r'){2,}(?=[0-9OoIilSBZzGqQ])',
-        '-',
-        text
-    )
-
-
-
-    def clean_digit_run(m):
-        prefix = m.group(1)   # "ISBN " or "978" etc.
-        digits = m.group(2)   # the digit string that may have OCR errors
-        # Apply character-level substitutions that are only valid in digit positions
-        fixed = digits
-        fixed = fixed.replace('O', '0').replace('o', '0')  # O/o -> 0
-        fixed = fixed.replace('I', '1').replace('l', '1')  # I/l -> 1 (most common)
-        fixed = fixed.replace('S', '5')                     # S -> 5
-        fixed = fixed.replace('B', '8')                     # B -> 8 (978 prefix)
-        fixed = fixed.replace('Z', '2').replace('z', '2')  # Z/z -> 2
-        fixed = fixed.replace('G', '6')                     # G -> 6
-        fixed = fixed.replace('q', '9').replace('Q', '9')  # q/Q -> 9
-        return prefix + fixed
+    text = _DASH_COLLAPSE_RE.sub('-', text)
 
     # Pattern 1: after "ISBN[-10/-13][ :]" fix the following digit run
-    text = re.sub(
-        r'(ISBN[\-\u2010\u2011\u2012\u2013\u2014\u2015 ]?(?:1[03])?[\-\u2010\u2011\u2012\u2013\u2014\u2015 ]?:?\s*)([0-9OoIilSBZzGqQ][0-9OoIilSBZzGqQ \-\u2010\u2011\u2012\u2013\u2014\u2015]{8,17}[0-9OoIilXx])',
-        clean_digit_run,
-        text, flags=re.IGNORECASE
-    )
+    text = _OCR_LABELLED_RUN_RE.sub(_clean_digit_run, text)
 
     # Pattern 2: fix 978/979 prefix region (handles "97B-...", "97Z-...", "9780..." etc.)
-    text = re.sub(
-        r'(97[89Bz])([0-9OoIilSBZzGqQ \-\u2010\u2011\u2012\u2013\u2014\u2015]{10,16})',
-        clean_digit_run,
-        text, flags=re.IGNORECASE
-    )
+    text = _OCR_EAN_RUN_RE.sub(_clean_digit_run, text)
 
     # Pattern 3: standalone digit runs that start with a digit-or-lookalike
     # followed by hyphens (typical isbn10 bare format: O-671-42517-X)
-    text = re.sub(r'(?<!\w)O(?=[-\s]?[0-9])', '0', text)
-    text = re.sub(r'(?<!\w)I(?=[-\s]?[0-9])', '1', text)
-    text = re.sub(r'(?<!\w)l(?=[-\s]?[0-9])', '1', text)
+    text = _OCR_BARE_O_RE.sub('0', text)
+    text = _OCR_BARE_I_RE.sub('1', text)
+    text = _OCR_BARE_L_RE.sub('1', text)
 
     return text
 
@@ -320,13 +698,8 @@ def extract_isbns_from_text(text):
         cleaned = re.sub(r'[^0-9Xx]', '', raw).upper()
         if len(cleaned) == 10 and cleaned not in results:
             # Validate ISBN-10 check digit
-            try:
-                total = sum((10 - i) * (10 if c == 'X' else int(c))
-                            for i, c in enumerate(cleaned))
-                if total % 11 == 0:
-                    results.append(raw)
-            except Exception:
-                pass
+            if _isbn10_total(cleaned) % 11 == 0:
+                results.append(raw)
 
     # Second pass on ISBN_RE results: if an isbn10 fails validation,
     # try alternate OCR interpretations (I/l could be 0 not 1 in publisher prefix)
@@ -334,13 +707,11 @@ def extract_isbns_from_text(text):
     for raw in results:
         c = re.sub(r'[^0-9Xx]', '', raw).upper()
         if len(c) == 10:
-            total = sum((10-i)*(10 if ch=='X' else int(ch)) for i,ch in enumerate(c))
-            if total % 11 != 0:
+            if _isbn10_total(c) % 11 != 0:
                 # Try replacing 1s that came from I/l OCR with 0
                 alt = re.sub(r'(?<![0-9])1(?=[0-9])', '0', c, count=1)
                 if alt != c:
-                    alt_total = sum((10-i)*(10 if ch=='X' else int(ch)) for i,ch in enumerate(alt))
-                    if alt_total % 11 == 0:
+                    if _isbn10_total(alt) % 11 == 0:
                         raw = alt
         if raw not in final:
             final.append(raw)
@@ -355,6 +726,49 @@ def extract_isbns_from_text(text):
 
     return results
 
+# EPUB container/OPF parsing and front-matter detection
+_HTML_TAG_RE      = re.compile(r'<[^>]+>')
+_HTML_EXT_RE      = re.compile(r'\.(xhtml|html|htm)$', re.I)
+_OPF_PATH_RE      = re.compile(r'full-path="([^"]+\.opf)"')
+_OPF_DC_RE        = re.compile(r'<dc:[^>]+>([^<]+)</dc:')
+_OPF_ITEM_RE      = re.compile(r'<item\b[^>]*\bid="([^"]+)"[^>]*\bhref="([^"]+)"')
+_OPF_ITEMREF_RE   = re.compile(r'<itemref\b[^>]*\bidref="([^"]+)"')
+_FRONT_MATTER_RE  = re.compile(r'isbn|copyright|cataloging|lcc\s*:|call.?no|97[89]\d{10}|\d{9}[\dXx]', re.I)
+
+# Per-entry read cap — copyright/CIP pages are small, chapters can be several MB
+_EPUB_ENTRY_BYTES = 256 * 1024
+
+def _read_epub_entry(zf, name):
+    """Decode the first _EPUB_ENTRY_BYTES of a zip member without inflating the rest."""
+    with zf.open(name) as fp:
+        return fp.read(_EPUB_ENTRY_BYTES).decode('utf-8', errors='replace')
+
+def _has_isbn_and_lc(text):
+    """
+    True once text already yields a checksum-valid ISBN-13 and an LC call
+    number, so readers can stop early. Callers only ask after appending a
+    chunk with front-matter cues (_FRONT_MATTER_RE), keeping the cost off books
+    with no CIP data.
+    """
+    isbn10, isbn13 = best_isbn(extract_isbns_from_text(text))
+    # An ISBN-10 alone isn't final: best_isbn prefers any ISBN-13 read later
+    return isbn10 is None and isbn13 is not None and bool(extract_lc_from_text(text))
+
+def _strip_html(raw):
+    """
+    Reduce an HTML/XHTML document to plain text with whitespace collapsed.
+    Uses lxml's C parser when available, otherwise a tag-stripping regex.
+    """
+    if LXML_AVAILABLE:
+        try:
+            root = etree.HTML(raw.encode('utf-8', errors='replace'),
+                              etree.HTMLParser(encoding='utf-8'))
+            if root is not None:
+                return ' '.join(' '.join(root.itertext()).split())
+        except Exception:
+            pass
+    return ' '.join(_HTML_TAG_RE.sub(' ', raw).split())
+
 def extract_text_epub(path, max_chars=80000):
     """
     Extract text from an EPUB in spine reading order.
@@ -373,7 +787,7 @@ def extract_text_epub(path, max_chars=80000):
             opf_dir  = ''
             try:
                 container = zf.read('META-INF/container.xml').decode('utf-8', errors='replace')
-                m = re.search(r'full-path="([^"]+\.opf)"', container)
+                m = _OPF_PATH_RE.search(container)
                 if m:
                     opf_path = m.group(1)
                     opf_dir  = opf_path.rsplit('/', 1)[0] + '/' if '/' in opf_path else ''
@@ -386,23 +800,23 @@ def extract_text_epub(path, max_chars=80000):
                 try:
                     opf_xml = zf.read(opf_path).decode('utf-8', errors='replace')
                     # Pull dc: metadata (title, creator, subject, description)
-                    dc_text = ' '.join(re.findall(r'<dc:[^>]+>([^<]+)</dc:', opf_xml))
+                    dc_text = ' '.join(_OPF_DC_RE.findall(opf_xml))
                     if dc_text.strip():
                         text_parts.append(dc_text)
 
                     # Build id→href map from manifest
                     id_to_href = {}
-                    for m in re.finditer(r'<item\b[^>]*\bid="([^"]+)"[^>]*\bhref="([^"]+)"', opf_xml):
+                    for m in _OPF_ITEM_RE.finditer(opf_xml):
                         id_to_href[m.group(1)] = m.group(2)
 
                     # Read spine idref order
-                    for m in re.finditer(r'<itemref\b[^>]*\bidref="([^"]+)"', opf_xml):
+                    for m in _OPF_ITEMREF_RE.finditer(opf_xml):
                         idref = m.group(1)
                         if idref in id_to_href:
                             href = id_to_href[idref]
                             # Resolve relative to OPF directory
                             full = opf_dir + href if not href.startswith('/') else href.lstrip('/')
-                            if re.search(r'\.(xhtml|html|htm)$', full, re.I):
+                            if _HTML_EXT_RE.search(full):
                                 spine_files.append(full)
                 except Exception:
                     pass
@@ -410,22 +824,25 @@ def extract_text_epub(path, max_chars=80000):
             # ── Step 3: fall back to alphabetical if spine empty ──────────
             if not spine_files:
                 spine_files = sorted(
-                    n for n in names_set if re.search(r'\.(xhtml|html|htm)$', n, re.I)
+                    n for n in names_set if _HTML_EXT_RE.search(n)
                 )
 
             # ── Step 4: read up to 15 spine files or max_chars ───────────
             read_names = set()
+            total = sum(len(p) for p in text_parts)
             for name in spine_files[:15]:
                 if name not in names_set:
                     continue
                 try:
-                    raw   = zf.read(name).decode('utf-8', errors='replace')
-                    plain = re.sub(r'<[^>]+>', ' ', raw)
-                    plain = re.sub(r'\s{2,}', ' ', plain).strip()
+                    plain = _strip_html(_read_epub_entry(zf, name))
                     text_parts.append(plain)
                     read_names.add(name)
-                    if sum(len(p) for p in text_parts) >= max_chars:
+                    total += len(plain)
+                    if total >= max_chars:
                         break
+                    # Copyright page found — skip the remaining chapters and step 5
+                    if _FRONT_MATTER_RE.search(plain) and _has_isbn_and_lc('\n'.join(text_parts)):
+                        return '\n'.join(text_parts)
                 except Exception:
                     pass
 
@@ -435,7 +852,7 @@ def extract_text_epub(path, max_chars=80000):
             # Prioritise files with copyright-suggestive names, then read
             # remaining manifest HTML files we haven't seen yet.
             all_html = [n for n in names_set
-                        if re.search(r'\.(xhtml|html|htm)$', n, re.I)
+                        if _HTML_EXT_RE.search(n)
                         and n not in read_names]
 
             # Sort: copyright/title/front-matter names first
@@ -448,15 +865,14 @@ def extract_text_epub(path, max_chars=80000):
                 return 1
 
             for name in sorted(all_html, key=_front_priority)[:10]:
-                if sum(len(p) for p in text_parts) >= max_chars:
+                if total >= max_chars:
                     break
                 try:
-                    raw   = zf.read(name).decode('utf-8', errors='replace')
-                    plain = re.sub(r'<[^>]+>', ' ', raw)
-                    plain = re.sub(r'\s{2,}', ' ', plain).strip()
+                    plain = _strip_html(_read_epub_entry(zf, name))
                     # Only include if it looks like front matter (has ISBN/LC/copyright keywords)
-                    if re.search(r'isbn|copyright|cataloging|lcc\s*:|call.?no|97[89]\d{10}|\d{9}[\dXx]', plain, re.I):
+                    if _FRONT_MATTER_RE.search(plain):
                         text_parts.append(plain)
+                        total += len(plain)
                 except Exception:
                     pass
 
@@ -470,16 +886,23 @@ def extract_text_pdf(path, max_pages=10):
         return ''
     try:
         if PDF_SUPPORT is True:  # fitz/PyMuPDF
-            doc = fitz.open(path)
-            pages = min(max_pages, len(doc))
-            return ' '.join(doc[i].get_text() for i in range(pages))
+            with _PDF_LOCK, fitz.open(path) as doc:
+                parts = []
+                for i in range(min(max_pages, len(doc))):
+                    page = doc[i].get_text()
+                    parts.append(page)
+                    # Copyright page found — skip rendering the remaining pages
+                    if _FRONT_MATTER_RE.search(page) and _has_isbn_and_lc(' '.join(parts)):
+                        break
+                return ' '.join(parts)
         elif PDF_SUPPORT == "pdfminer":
             return pdfminer_extract(path, maxpages=max_pages) or ''
     except Exception:
         return ''
 
-# Valid LC class prefixes (single and double letter)
-_LC_CLASSES = {
+# Valid LC class prefixes (single and double letter); frozen, since scan and
+# lookup threads all test against it
+_LC_CLASSES = frozenset({
     'A','B','C','D','E','F','G','H','J','K','L','M','N','P','Q','R','S','T','U','V','Z',
     'BF','BL','BQ','BR','BS','BT','BV','BX','CB','CC','CD','CR','CS','CT',
     'DA','DC','DD','DE','DF','DG','DH','DJ','DK','DL','DP','DQ','DR','DS','DT','DU','DX',
@@ -492,16 +915,42 @@ _LC_CLASSES = {
     'RA','RB','RC','RD','RE','RF','RG','RJ','RK','RL','RM','RS','RT','RV','RX','RZ',
     'SB','SD','SF','SH','SK','TA','TC','TD','TE','TF','TG','TH','TJ','TK','TL','TN','TP','TR','TS','TT','TX',
     'UA','UB','UC','UD','UE','UF','UG','UH','VA','VB','VC','VD','VE','VF','VG','VK','VM','ZA'
-}
+})
+
+# Leading class letters of a call number, checked against _LC_CLASSES
+_LC_PREFIX_RE = re.compile(r'[A-Z]+')
 
 # Pattern: 1-3 uppercase letters, digits, at least one Cutter (.Letter+digits)
+# Every repetition is bounded or unambiguous (the Cutter tail is \d*(?:[A-Z]\d*)?
+# rather than \d*[A-Z]?\d*) so a long digit run in OCR noise has only one parse.
 _LC_PATTERN = re.compile(
     r'\b([A-Z]{1,3}\d{1,5}(?:\.\d+)?'         # class letters + digits
-    r'(?:\s*\.[A-Z]\d*[A-Z]?\d*){1,2}'        # 1-2 dot-Cutter numbers
+    r'(?:\s*\.[A-Z]\d*(?:[A-Z]\d*)?){1,2}'    # 1-2 dot-Cutter numbers
     r'(?:\s+[A-Z]\d+)?'                         # optional space-cutter (e.g. A3, B7)
     r'(?:\s+\d{4}[a-z]{0,3})?)'                # optional year + suffix (eb, b, x, etc.)
 )
 
+# With pyahocorasick, one automaton pass over the text finds every class prefix.
+# _LC_PATTERN only has to be tried where a prefix is directly followed by a digit;
+# when none of those match, the full finditer scan is skipped.
+if AHOCORASICK_AVAILABLE:
+    _LC_AC = ahocorasick.Automaton()
+    for _cls in _LC_CLASSES:
+        _LC_AC.add_word(_cls, _cls)
+    _LC_AC.make_automaton()
+
+def _lc_matches(text):
+    """Yield _LC_PATTERN matches in text, skipping texts with no valid class prefix."""
+    if AHOCORASICK_AVAILABLE:
+        n = len(text)
+        for end, cls in _LC_AC.iter(text):
+            if end + 1 < n and text[end + 1].isdigit() \
+                    and _LC_PATTERN.match(text, end - len(cls) + 1):
+                break
+        else:
+            return
+    yield from _LC_PATTERN.finditer(text)
+
 # Explicit label pattern - most reliable
 _LC_LABELLED = re.compile(
     r'(?:lcc|LC|Library\s+of\s+Congress|Call\s+[Nn]o\.?|Classification)\s*[:\s]\s*'
@@ -509,6 +958,16 @@ _LC_LABELLED = re.compile(
     re.IGNORECASE
 )
 
+# Bracketed shelf number in a CIP block, e.g. "[PS3559.R68]"
+_LC_BRACKETED_RE = re.compile(
+    r'\[([A-Z]{1,3}\d{1,5}(?:\.\d+)?(?:\.[A-Z]\d*)+(?:\s+[A-Z]\d+)?(?:\s+\d{4}[a-z]{0,3})?)\]'
+)
+# Copyright-page anchor words plus the 1200 chars after them
+_LC_ANCHOR_RE = re.compile(
+    r'(?:isbn|copyright|published by|all rights reserved|cataloging.in.publication|lcc\s*:).{0,1200}',
+    re.IGNORECASE | re.DOTALL
+)
+
 def extract_lc_from_text(text):
     if not text:
         return ''
@@ -519,43 +978,47 @@ def extract_lc_from_text(text):
 
     # Pre-pass: find LC numbers inside brackets [CLASS.CUTTER YEAR] in CIP lines.
     # e.g. "PZ4.I714Wo 1978 [PS3559.R68]" — the bracketed one is the preferred shelf number.
-    bracketed = re.findall(
-        r'\[([A-Z]{1,3}\d{1,5}(?:\.\d+)?(?:\.[A-Z]\d*)+(?:\s+[A-Z]\d+)?(?:\s+\d{4}[a-z]{0,3})?)\]',
-        text
-    )
+    bracketed = _LC_BRACKETED_RE.findall(text)
     for candidate in bracketed:
-        prefix_m = re.match(r'[A-Z]+', candidate)
+        prefix_m = _LC_PREFIX_RE.match(candidate)
         if prefix_m and prefix_m.group() in _LC_CLASSES:
             return candidate.strip()
 
     # Unlabelled: search near copyright-page anchor words
-    anchor = re.search(
-        r'(?:isbn|copyright|published by|all rights reserved|cataloging.in.publication|lcc\s*:).{0,1200}',
-        text, re.IGNORECASE | re.DOTALL
-    )
+    anchor = _LC_ANCHOR_RE.search(text)
     # Primary: search within anchor window
     search_text = anchor.group(0) if anchor else text[:5000]
-    for m in _LC_PATTERN.finditer(search_text):
+    for m in _lc_matches(search_text):
         candidate = m.group(1).strip()
-        prefix_m = re.match(r'[A-Z]+', candidate)
+        prefix_m = _LC_PREFIX_RE.match(candidate)
         if prefix_m and prefix_m.group() in _LC_CLASSES:
             return candidate
     # Fallback: scan full first 5000 chars (catches call numbers far from ISBN)
     if anchor:
-        for m in _LC_PATTERN.finditer(text[:5000]):
+        for m in _lc_matches(text[:5000]):
             candidate = m.group(1).strip()
-            prefix_m = re.match(r'[A-Z]+', candidate)
+            prefix_m = _LC_PREFIX_RE.match(candidate)
             if prefix_m and prefix_m.group() in _LC_CLASSES:
                 return candidate
     return ''
 
 
+# MOBI text is scanned as raw bytes straight off an mmap of the file
+_MOBI_HEAD_BYTES = 1024 * 1024
+_MOBI_TAIL_BYTES = 48 * 1024    # 40KB tail plus slack for tags stripped out of it
+_MOBI_CTRL_RE = re.compile(rb'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_MOBI_CTRL_HI_RE = re.compile(rb'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]')
+_MOBI_TAG_RE = re.compile(rb'<[^>]{0,200}>')
+_MOBI_READABLE_RUN_RE = re.compile(rb'[ -~\n\r\t]{20,}')
+_MOBI_WORD_RE = re.compile(rb'[A-Za-z]{3,}')
+_MOBI_RAW_CHUNK_RE = re.compile(rb'[A-Za-z0-9 .,:;\'\"\-/\(\)]{15,}')
+
 def extract_text_mobi(path, max_chars=80000):
     """
     Extract text from MOBI/AZW/AZW3 files.
     AZW3 is ZIP-based (like EPUB). MOBI is PalmDB binary with embedded HTML.
     """
-    ext = Path(path).suffix.lower()
+    ext = _file_ext(path)
 
     # AZW3 files are ZIP/EPUB containers — try that first
     if ext in ('.azw3', '.azw'):
@@ -567,48 +1030,57 @@ def extract_text_mobi(path, max_chars=80000):
             pass
 
     try:
-        fsize = os.path.getsize(path)
         with open(path, 'rb') as f:
-            # Read up to 1MB — covers copyright pages even in large MOBI files
-            # (copyright at 1% of a 5MB book = ~50KB; needs headroom for larger files)
-            data = f.read(min(1024 * 1024, fsize))
-
-        # Decode preserving all bytes
-        raw = data.decode('latin-1', errors='replace')
+            fsize = os.fstat(f.fileno()).st_size
+            if not fsize:
+                return ''
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Up to 1MB of head — covers copyright pages even in large MOBI files
+                # (copyright at 1% of a 5MB book = ~50KB; needs headroom for larger files)
+                data = mm[:_MOBI_HEAD_BYTES]
+                # Past the head window, take the tail from the real end of the file
+                end = mm[-_MOBI_TAIL_BYTES:] if fsize > _MOBI_HEAD_BYTES else None
+
+        # Everything below works on bytes; latin-1 maps them 1:1 when decoding at the end.
 
         # Strategy 1: find all HTML-like content (MOBI stores text as HTML internally)
-        # Strip null bytes and control chars first so regex works cleanly
-        clean = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f]', ' ', raw)
-        
-        # Find everything between HTML tags (MOBI uses <p>, <div>, etc.)
-        html_text = re.sub(r'<[^>]{0,200}>', ' ', clean)
-        
+        # Strip null bytes and control chars first so regex works cleanly, then
+        # drop everything between HTML tags (MOBI uses <p>, <div>, etc.)
+        html_text = _MOBI_TAG_RE.sub(b' ', _MOBI_CTRL_RE.sub(b' ', data))
+
         # Extract readable runs — must be at least 20 printable chars
         # IMPORTANT: in large MOBIs, the copyright page appears near the END of the
         # binary buffer (after record headers). One giant space-run can push the
         # ISBN past the max_chars cutoff.
-        # Solution: always include the TAIL of the buffer as well as the head.
-        readable_runs = re.findall(r'[ -~\n\r\t]{20,}', html_text)
+        # Solution: always include the TAIL of the file as well as the head.
+        readable_runs = _MOBI_READABLE_RUN_RE.findall(html_text)
         if readable_runs:
             # Head: first 40KB worth
-            head = '\n'.join(readable_runs)[:40000]
-            # Tail: last 40KB of the buffer (where copyright page tends to sit)
-            tail = html_text[-40000:]
-            combined = head + '\n' + tail
-            if re.search(r'[A-Za-z]{3,}', combined):
-                return combined[:max_chars]
+            head = b'\n'.join(readable_runs)[:40000]
+            # Tail: last 40KB of the file (where copyright page tends to sit)
+            if end is None:
+                tail = html_text[-40000:]
+            else:
+                tail = _MOBI_TAG_RE.sub(b' ', _MOBI_CTRL_RE.sub(b' ', end))[-40000:]
+            combined = head + b'\n' + tail
+            if _MOBI_WORD_RE.search(combined):
+                return combined[:max_chars].decode('latin-1')
 
         # Strategy 2: raw byte scan — always include both head and tail
-        raw_text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', ' ', raw)
-        head_chunks = re.findall(r'[A-Za-z0-9 .,:;\'\"\-/\(\)]{15,}', raw_text[:40000])
-        tail_chunks = re.findall(r'[A-Za-z0-9 .,:;\'\"\-/\(\)]{15,}', raw_text[-40000:])
-        return ('\n'.join(head_chunks) + '\n' + '\n'.join(tail_chunks))[:max_chars]
+        head_chunks = _MOBI_RAW_CHUNK_RE.findall(_MOBI_CTRL_HI_RE.sub(b' ', data[:40000]))
+        tail_chunks = _MOBI_RAW_CHUNK_RE.findall(
+            _MOBI_CTRL_HI_RE.sub(b' ', (data if end is None else end)[-40000:]))
+        return (b'\n'.join(head_chunks) + b'\n' + b'\n'.join(tail_chunks))[:max_chars].decode('latin-1')
 
     except Exception:
         return ''
 
-def extract_isbn_from_file(path):
-    ext = Path(path).suffix.lower()
+def _file_ext(path):
+    """Lowercased extension of the final path component, like Path(path).suffix.lower()."""
+    return os.path.splitext(path)[1].lower()
+
+def extract_text_from_file(path):
+    ext = _file_ext(path)
     text = ''
     if ext == '.epub':
         text = extract_text_epub(path)
@@ -616,26 +1088,96 @@ def extract_isbn_from_file(path):
         text = extract_text_pdf(path)
     elif ext in ('.mobi', '.azw', '.azw3'):
         text = extract_text_mobi(path)
+    return text
 
+def extract_isbn_from_text(text):
     candidates = extract_isbns_from_text(text)
     isbn10, isbn13 = best_isbn(candidates)
     lc = extract_lc_from_text(text)
     return isbn10, isbn13, lc
 
+# ─── Text Cache ──────────────────────────────────────────────────────────────
+
+# zstd frames are recognised by their magic number; anything else is zlib
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+def _pack_text(text):
+    data = text.encode('utf-8', errors='replace')
+    if ZSTD_AVAILABLE:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+def _unpack_text(blob):
+    """Decompress a text_cache blob, or None if it needs a codec we don't have."""
+    blob = bytes(blob)
+    if blob[:4] == _ZSTD_MAGIC:
+        if not ZSTD_AVAILABLE:
+            return None
+        data = zstandard.ZstdDecompressor().decompress(blob)
+    else:
+        data = zlib.decompress(blob)
+    return data.decode('utf-8', errors='replace')
+
+# Errors a damaged text_cache blob can raise while decompressing
+_TEXT_DECODE_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if ZSTD_AVAILABLE else ())
+
+# One read-only connection per scan worker thread, like _cache_conn()
+_text_tls = threading.local()
+
+def _text_cache_get(sha1):
+    """Cached extracted text for a file's content, or None on a miss."""
+    try:
+        conn = getattr(_text_tls, 'conn', None)
+        if conn is None:
+            conn = _text_tls.conn = get_db_ro()
+        row = conn.execute(
+            "SELECT extracted_text FROM text_cache WHERE file_sha1=?", (sha1,)
+        ).fetchone()
+    except sqlite3.Error:
+        # Reconnect on the next call
+        conn, _text_tls.conn = getattr(_text_tls, 'conn', None), None
+        if conn is not None:
+            conn.close()
+        return None
+    if not row:
+        return None
+    try:
+        return _unpack_text(row[0])
+    except _TEXT_DECODE_ERRORS:
+        return None
+
+def extract_isbn_cached(path, sha1):
+    """
+    extract_isbn_from_text(extract_text_from_file(path)) through text_cache.
+    Returns ((isbn10, isbn13, lc), blob) where blob is the compressed text to
+    store under sha1, or None when nothing new needs caching.
+    """
+    text = _text_cache_get(sha1) if sha1 else None
+    blob = None
+    if text is None:
+        text = extract_text_from_file(path)
+        # Empty results aren't cached — a PDF library installed later may read them
+        if sha1 and text.strip():
+            blob = _pack_text(text)
+    return extract_isbn_from_text(text), blob
+
 # ─── SHA1 Hashing ────────────────────────────────────────────────────────────
 
-def sha1_file(path, chunk_size=1024 * 1024):
-    """SHA1 of file contents. Used to detect renames/moves."""
-    import hashlib
-    h = hashlib.sha1()
+def sha1_file(path):
+    """
+    SHA1 of file contents. Used to detect renames/moves.
+    Hashes in a single C call: hashlib.file_digest on Python 3.11+,
+    otherwise one update() over a read-only mmap of the file.
+    """
     try:
         with open(path, 'rb') as f:
-            while True:
-                chunk = f.read(chunk_size)
-                if not chunk:
-                    break
-                h.update(chunk)
-        return h.hexdigest()
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, 'sha1').hexdigest()
+            h = hashlib.sha1()
+            if os.fstat(f.fileno()).st_size:  # mmap rejects empty files
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    h.update(mm)
+            return h.hexdigest()
     except Exception:
         return None
 
@@ -704,10 +1246,32 @@ def parse_lc(lc_raw):
 
 # ─── Library of Congress SRU Lookup ──────────────────────────────────────────
 
-def query_loc_for_lc_number(isbn):
+# MARC 050 (LC call number) subfields $a (class/number) and $b (item number)
+_MARC050_A_RE = re.compile(r'tag=["\']050["\'][^>]*>.*?code=["\']a["\'][^>]*>([^<]+)', re.DOTALL)
+_MARC050_B_RE = re.compile(r'tag=["\']050["\'][^>]*>.*?code=["\']b["\'][^>]*>([^<]+)', re.DOTALL)
+
+# LOC allows about 40 SRU requests per minute per IP; the background jobs
+# (Phase 2, the LC batch job) share this much lower budget. Their workers
+# queue for it, so interactive callers leave throttle off and go straight out.
+LOC_SRU_PER_MIN = 12
+_LOC_SRU_LOCK = threading.Lock()
+_loc_sru_next = 0.0
+
+def _loc_sru_wait():
+    """Block until this thread may send the next LOC SRU request."""
+    global _loc_sru_next
+    with _LOC_SRU_LOCK:
+        now = time.monotonic()
+        at = max(now, _loc_sru_next)
+        _loc_sru_next = at + 60 / LOC_SRU_PER_MIN
+    if at > now:
+        time.sleep(at - now)
+
+def query_loc_for_lc_number(isbn, throttle=False):
     """
     Query the Library of Congress SRU endpoint by ISBN to get the LC call number.
     Free, no key required. Returns call number string or None.
+    throttle=True spaces the request under LOC_SRU_PER_MIN (background jobs).
     """
     if not isbn:
         return None
@@ -719,28 +1283,38 @@ def query_loc_for_lc_number(isbn):
         '&recordSchema=marcxml&maximumRecords=3'
         f'&query=bath.isbn%3D{isbn}'
     )
+    if throttle:
+        _loc_sru_wait()
     try:
-        import urllib.request
-        req = urllib.request.Request(url, headers={'User-Agent': 'BookMeta/1.0'})
-        with urllib.request.urlopen(req, timeout=6) as r:
-            xml = r.read().decode('utf-8', errors='replace')
-        m_a = re.search(r'tag=["\']050["\'][^>]*>.*?code=["\']a["\'][^>]*>([^<]+)', xml, re.DOTALL)
-        m_b = re.search(r'tag=["\']050["\'][^>]*>.*?code=["\']b["\'][^>]*>([^<]+)', xml, re.DOTALL)
+        xml = http_fetch(url).decode('utf-8', errors='replace')
+        m_a = _MARC050_A_RE.search(xml)
+        m_b = _MARC050_B_RE.search(xml)
         if m_a:
             call = m_a.group(1).strip()
             if m_b:
                 call = call + ' ' + m_b.group(1).strip()
-            prefix = re.match(r'[A-Z]+', call)
+            prefix = _LC_PREFIX_RE.match(call)
             if prefix and prefix.group() in _LC_CLASSES:
                 _cache_set('loc_sru', isbn, call)
                 return call.strip()
         # Cache negative result so we don't retry
         _cache_set('loc_sru', isbn, '')
+    except urllib.error.HTTPError as e:
+        if e.code in _HTTP_GONE:
+            _cache_set('loc_sru', isbn, '')
     except Exception:
         pass
     return None
 
 
+# Classify's most popular LCC in one pass — group 1 is the normalised (nsfa)
+# form, group 2 the as-printed (sfa) form; either may be missing
+_LCC_MOSTPOP_RE = re.compile(
+    r'<lcc>\s*<mostPopular'
+    r'(?=[^>]*\snsfa=["\']([^"\']+)["\'])?'
+    r'(?=[^>]*\ssfa=["\']([^"\']+)["\'])?'
+)
+
 def query_oclc_classify_for_lc(isbn):
     """
     Query OCLC Classify API by ISBN to get LC call number.
@@ -754,81 +1328,269 @@ def query_oclc_classify_for_lc(isbn):
         return cached if cached else None
     url = f'http://classify.oclc.org/classify2/Classify?isbn={isbn}&summary=true'
     try:
-        import urllib.request
-        req = urllib.request.Request(url, headers={'User-Agent': 'BookMeta/1.0'})
-        with urllib.request.urlopen(req, timeout=6) as r:
-            xml = r.read().decode('utf-8', errors='replace')
-        m = re.search(r'<lcc>\s*<mostPopular[^>]+nsfa=["\']([^"\']+)["\']', xml)
-        if not m:
-            m = re.search(r'<lcc>\s*<mostPopular[^>]+sfa=["\']([^"\']+)["\']', xml)
-        if m:
-            call = m.group(1).strip()
-            prefix = re.match(r'[A-Z]+', call)
+        xml = http_fetch(url).decode('utf-8', errors='replace')
+        m = _LCC_MOSTPOP_RE.search(xml)
+        call = m and (m.group(1) or m.group(2))
+        if call:
+            call = call.strip()
+            prefix = _LC_PREFIX_RE.match(call)
             if prefix and prefix.group() in _LC_CLASSES:
                 _cache_set('oclc_classify', isbn, call)
                 return call
         _cache_set('oclc_classify', isbn, '')
+    except urllib.error.HTTPError as e:
+        if e.code in _HTTP_GONE:
+            _cache_set('oclc_classify', isbn, '')
     except Exception:
         pass
     return None
 
 # ─── Metadata Lookup ─────────────────────────────────────────────────────────
 
-def http_get(url, timeout=6):
-    if not HTTP_AVAILABLE:
-        return None
+def _json_loads(data):
+    """Parse JSON from a str or UTF-8 bytes."""
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+def _json_dumps(obj):
+    """Serialise to a JSON str (compact when orjson is available)."""
+    return orjson.dumps(obj).decode('utf-8') if ORJSON_AVAILABLE else json.dumps(obj)
+
+_HTTP_HEADERS = {'User-Agent': 'BookMeta/1.0'}
+
+# Rate-limit and transient server errors are retried this many times, after
+# the server's Retry-After when it sends one, else _HTTP_BACKOFF, then twice
+# that, ... seconds. A Retry-After longer than _HTTP_MAX_RETRY_AFTER raises
+# instead: these calls run on request threads and the lookup pools.
+_HTTP_RETRY_STATUS = (429, 500, 502, 503, 504)
+_HTTP_RETRIES = 2
+_HTTP_BACKOFF = 0.3
+_HTTP_MAX_RETRY_AFTER = 10
+# Answers that mean "there is nothing here": cached as misses like an empty result
+_HTTP_GONE = (404, 410)
+
+if URLLIB3_AVAILABLE:
+    class _CappedRetry(urllib3.Retry):
+        """Retry that returns the response instead of sleeping out a long Retry-After."""
+        def increment(self, method=None, url=None, response=None, *args, **kwargs):
+            if (response is not None and response.status in _HTTP_RETRY_STATUS
+                    and (self.get_retry_after(response) or 0) > _HTTP_MAX_RETRY_AFTER):
+                raise urllib3.exceptions.MaxRetryError(kwargs.get('_pool'), url)
+            return super().increment(method, url, response, *args, **kwargs)
+
+    # One keep-alive pool per host, shared by every lookup and thread, so
+    # repeat requests to the same API skip the TCP/TLS handshake
+    _HTTP_POOL = urllib3.PoolManager(
+        maxsize=16, headers=dict(_HTTP_HEADERS, **{'Accept-Encoding': 'gzip'}),
+        retries=_CappedRetry(connect=2, read=0, redirect=10, status=_HTTP_RETRIES,
+                             status_forcelist=_HTTP_RETRY_STATUS, backoff_factor=_HTTP_BACKOFF,
+                             respect_retry_after_header=True, raise_on_status=False),
+    )
+
+# Without urllib3: one persistent http.client connection per (thread, host)
+_HTTP_TLS = threading.local()
+_HTTP_REDIRECTS = (301, 302, 303, 307, 308)
+
+def _keepalive_request(url, timeout, headers):
+    """http_request() over reused http.client connections, following redirects."""
+    conns = _HTTP_TLS.__dict__.setdefault('conns', {})
+    for _ in range(10):
+        parts = urllib.parse.urlsplit(url)
+        target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        key = (parts.scheme, parts.netloc)
+        # A pooled connection the server has since closed fails on first use;
+        # retry that once on a fresh one
+        for attempt in range(2):
+            conn = conns.get(key)
+            reused = conn is not None
+            if conn is None:
+                cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+                conn = conns[key] = cls(parts.netloc, timeout=timeout)
+            try:
+                conn.request('GET', target, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                del conns[key]
+                if not reused or attempt:
+                    raise
+        if resp.will_close:
+            conn.close()
+            del conns[key]
+        location = resp.getheader('Location')
+        if resp.status in _HTTP_REDIRECTS and location:
+            url = urllib.parse.urljoin(url, location)
+            continue
+        return url, resp.status, resp.reason, resp.msg, body
+    raise urllib.error.HTTPError(url, resp.status, 'Too many redirects', resp.msg, io.BytesIO(body))
+
+def _urlopen_request(url, timeout, headers):
+    """http_request() through urllib, which handles proxies."""
+    req = urllib.request.Request(url, headers=headers)
     try:
-        req = urllib.request.Request(url, headers={'User-Agent': 'BookMeta/1.0'})
         with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read().decode('utf-8'))
-    except Exception:
-        return None
+            return resp.url, resp.status, resp.reason, resp.headers, resp.read()
+    except urllib.error.HTTPError as e:
+        return url, e.code, e.reason, e.headers, e.read()
 
-def _cache_get(source, query):
-    """Return cached response data if present and not expired (30 days)."""
+def http_request(url, timeout=6, headers=None):
+    """
+    GET url with optional extra request headers; returns (status, response
+    headers, body). 304 Not Modified comes back like a success, 4xx/5xx raise
+    urllib.error.HTTPError.
+    """
+    if URLLIB3_AVAILABLE:
+        r = _HTTP_POOL.request('GET', url, timeout=timeout,
+                               headers=dict(_HTTP_POOL.headers, **headers) if headers else None)
+        if r.status >= 400:
+            raise urllib.error.HTTPError(url, r.status, r.reason, r.headers, io.BytesIO(r.data))
+        return r.status, r.headers, r.data
+    headers = dict(_HTTP_HEADERS, **headers) if headers else _HTTP_HEADERS
+    send = (_keepalive_request if urllib.parse.urlsplit(url).scheme not in urllib.request.getproxies()
+            else _urlopen_request)
+    for attempt in range(_HTTP_RETRIES + 1):
+        if attempt:
+            time.sleep(delay)
+        final_url, status, reason, resp_headers, body = send(url, timeout, headers)
+        if status not in _HTTP_RETRY_STATUS:
+            break
+        retry_after = (resp_headers.get('Retry-After') or '').strip()
+        delay = int(retry_after) if retry_after.isdigit() else _HTTP_BACKOFF * 2 ** attempt
+        if delay > _HTTP_MAX_RETRY_AFTER:
+            break
+    if status >= 400:
+        raise urllib.error.HTTPError(final_url, status, reason, resp_headers, io.BytesIO(body))
+    return status, resp_headers, body
+
+def http_fetch(url, timeout=6):
+    """GET url and return the response body. Raises urllib.error.HTTPError on 4xx/5xx."""
+    return http_request(url, timeout)[2]
+
+def _cache_key(query):
+    """16-byte BLAKE2b digest of a cache query — the indexed half of api_cache's key."""
+    return hashlib.blake2b(query.encode('utf-8'), digest_size=16).digest()
+
+# One autocommit connection per worker thread for api_cache traffic; Phase 2
+# and the LC batch jobs hit the cache several times per book.
+_cache_tls = threading.local()
+
+def _cache_conn():
+    conn = getattr(_cache_tls, 'conn', None)
+    if conn is None:
+        conn = _apply_pragmas(sqlite3.connect(DB_PATH, timeout=20, isolation_level=None))
+        _cache_tls.conn = conn
+    return conn
+
+def _cache_reset():
+    """Drop this thread's cache connection after an error so the retry reconnects."""
+    conn = getattr(_cache_tls, 'conn', None)
+    _cache_tls.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def _cache_entry(source, query):
+    """Raw api_cache row (response_json, expires_at, etag, last_modified), expired or not."""
     for _ in range(3):
         try:
-            conn = sqlite3.connect(DB_PATH, timeout=20)
-            conn.execute("PRAGMA journal_mode=WAL")
-            row = conn.execute(
-                "SELECT response_json FROM api_cache WHERE source=? AND query=? "
-                "AND cached_at > datetime('now', '-30 days')",
-                (source, query)
+            return _cache_conn().execute(
+                "SELECT response_json, expires_at, etag, last_modified FROM api_cache "
+                "WHERE source=? AND query_hash=?",
+                (source, _cache_key(query))
             ).fetchone()
-            conn.close()
-            if row is not None:
-                return json.loads(row[0]) if row[0] else ''
-            return None
         except Exception:
+            _cache_reset()
+    return None
+
+def _cache_value(response_json):
+    return _json_loads(response_json) if response_json else ''
+
+def _cache_get(source, query):
+    """Return cached response data if present and not expired (CACHE_TTL)."""
+    row = _cache_entry(source, query)
+    if row is not None and (row[1] or 0) > time.time():
+        try:
+            return _cache_value(row[0])
+        except ValueError:
             pass
     return None
 
-def _cache_set(source, query, data):
+def _cache_set(source, query, data, etag=None, last_modified=None):
     """Store API response in cache, retrying up to 3 times on lock."""
-    value = json.dumps(data) if (data is not None and data != '') else ''
+    value = _json_dumps(data) if (data is not None and data != '') else ''
     for _ in range(3):
         try:
-            conn = sqlite3.connect(DB_PATH, timeout=20)
-            conn.execute("PRAGMA journal_mode=WAL")
-            conn.execute(
-                "INSERT OR REPLACE INTO api_cache (source, query, response_json, cached_at) "
-                "VALUES (?, ?, ?, datetime('now'))",
-                (source, query, value)
+            _cache_conn().execute(
+                "INSERT OR REPLACE INTO api_cache "
+                "(source, query_hash, query, response_json, cached_at, expires_at, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, datetime('now'), ?, ?, ?)",
+                (source, _cache_key(query), query, value, int(time.time()) + CACHE_TTL,
+                 etag, last_modified)
             )
-            conn.commit()
-            conn.close()
             return
         except Exception:
-            import time; time.sleep(0.5)
+            _cache_reset()
+            time.sleep(0.5)
 
-def cached_http_get(source, query, url):
-    """http_get with transparent caching by (source, query) key."""
-    cached = _cache_get(source, query)
-    if cached is not None:
-        return cached
-    data = http_get(url)
+def _cache_renew(source, query):
+    """Start a fresh CACHE_TTL for an entry the server confirmed unchanged (304)."""
+    for _ in range(3):
+        try:
+            _cache_conn().execute(
+                "UPDATE api_cache SET cached_at=datetime('now'), expires_at=? "
+                "WHERE source=? AND query_hash=?",
+                (int(time.time()) + CACHE_TTL, source, _cache_key(query))
+            )
+            return
+        except Exception:
+            _cache_reset()
+            time.sleep(0.5)
+
+def cached_http_get(source, query, url, trim=None):
+    """
+    http_get with transparent caching by (source, query) key. An expired entry
+    that kept the server's ETag/Last-Modified is revalidated with a conditional
+    GET; a 304 renews it without downloading the body again.
+    trim(data), if given, cuts a fresh response down to what the caller reads
+    before it is cached and returned.
+    """
+    row = _cache_entry(source, query)
+    if row is not None and (row[1] or 0) > time.time():
+        try:
+            return _cache_value(row[0])
+        except ValueError:
+            row = None
+    if not HTTP_AVAILABLE:
+        return None
+    validators = {}
+    if row is not None:
+        if row[2]:
+            validators['If-None-Match'] = row[2]
+        if row[3]:
+            validators['If-Modified-Since'] = row[3]
+    try:
+        status, headers, body = http_request(url, headers=validators)
+        if status == 304 and validators:
+            data = _cache_value(row[0])
+            _cache_renew(source, query)
+            return data
+        data = _json_loads(body)
+        if trim and data:
+            data = trim(data)
+    except urllib.error.HTTPError as e:
+        # e.g. an unknown OpenLibrary work: remember the miss instead of
+        # asking again on every run
+        if e.code in _HTTP_GONE:
+            _cache_set(source, query, '')
+            return ''
+        return None
+    except Exception:
+        return None
     if data is not None:
-        _cache_set(source, query, data)
+        _cache_set(source, query, data, headers.get('ETag'), headers.get('Last-Modified'))
     return data
 
 # Optional Google Books API key — stored in a file next to the DB for persistence
@@ -847,6 +1609,21 @@ def _google_url(base):
     key = _get_google_api_key()
     return base + (f'&key={key}' if key else '')
 
+# Subject entries that are really call numbers, date codes or provenance notes
+_SUBJ_CALLNUM_RE    = re.compile(r'^[A-Z]{1,3}\d+')
+_SUBJ_DATECODE_RE   = re.compile(r'^[A-Z]{2,4}\s+\d{4}$')
+_SUBJ_PROVENANCE_RE = re.compile(r'\bformer owner\b|\bCollection copy\b|^PRO\b', re.I)
+
+# Common non-English subject words to skip (LC/OL frequently mix in foreign terms)
+_FOREIGN_SUBJECTS = frozenset({
+    'histoire', 'kunst', 'geschichte', 'philosophie', 'litterature',
+    'literatur', 'wissenschaft', 'recht', 'politik', 'wirtschaft', 'sprache',
+    'musique', 'droit', 'societe', 'gesellschaft', 'arte', 'storia', 'diritto',
+    'economia', 'filosofia', 'letteratura', 'matematica', 'fisica', 'chimica',
+    'biologia', 'historia', 'derecho', 'politica', 'educacion', 'sociologia',
+    'psicologia', 'antropologia', 'geografia', 'lingüística', 'linguistica',
+})
+
 def _clean_subjects(raw_subjects, max_subjects=8):
     """
     Clean a subjects list from any source into a tidy comma-separated string.
@@ -869,16 +1646,6 @@ def _clean_subjects(raw_subjects, max_subjects=8):
     else:
         return ''
 
-    # Common non-English subject words to skip (LC/OL frequently mix in foreign terms)
-    _foreign = {
-        'histoire', 'kunst', 'geschichte', 'kunst', 'philosophie', 'litterature',
-        'literatur', 'wissenschaft', 'recht', 'politik', 'wirtschaft', 'sprache',
-        'musique', 'droit', 'societe', 'gesellschaft', 'arte', 'storia', 'diritto',
-        'economia', 'filosofia', 'letteratura', 'matematica', 'fisica', 'chimica',
-        'biologia', 'historia', 'derecho', 'politica', 'educacion', 'sociologia',
-        'psicologia', 'antropologia', 'geografia', 'lingüística', 'linguistica',
-    }
-
     cleaned = []
     seen = set()
     for item in items:
@@ -886,28 +1653,29 @@ def _clean_subjects(raw_subjects, max_subjects=8):
         if not item or len(item) < 3:
             continue
         # Skip call-number-like strings
-        if re.match(r'^[A-Z]{1,3}\d+', item):
+        if _SUBJ_CALLNUM_RE.match(item):
             continue
         # Skip short all-caps codes and date codes like "CHR 1991"
-        if re.match(r'^[A-Z]{2,4}\s+\d{4}$', item):
+        if _SUBJ_DATECODE_RE.match(item):
             continue
         # Skip provenance/owner notes
-        if re.search(r'\bformer owner\b|\bCollection copy\b|^PRO\b', item, re.I):
+        if _SUBJ_PROVENANCE_RE.search(item):
             continue
-        # Skip non-ASCII-majority strings
-        ascii_ratio = sum(1 for c in item if ord(c) < 128) / max(len(item), 1)
-        if ascii_ratio < 0.8:
+        # Skip non-ASCII-majority strings (< 80% ASCII); encoding with 'ignore'
+        # keeps just the ASCII chars
+        if not item.isascii() and 5 * len(item.encode('ascii', 'ignore')) < 4 * len(item):
             continue
         # Skip overly long entries (> 60 chars)
         if len(item) > 60:
             continue
         # Skip known foreign-language subject words (including multi-word phrases starting with them)
-        first_word = item.split()[0].lower().rstrip("'")
-        if first_word in _foreign or item.lower() in _foreign:
+        lower = item.lower()
+        first_word = lower.split(None, 1)[0].rstrip("'")
+        if first_word in _FOREIGN_SUBJECTS or lower in _FOREIGN_SUBJECTS:
             continue
-        # Normalize
+        # Normalize (the stripped characters are unaffected by lower())
         item = item.strip('.,;: ')
-        lower = item.lower()
+        lower = lower.strip('.,;: ')
         if lower in seen:
             continue
         seen.add(lower)
@@ -917,6 +1685,17 @@ def _clean_subjects(raw_subjects, max_subjects=8):
 
     return ', '.join(cleaned)
 
+_YEAR4_RE = re.compile(r'\d{4}')
+
+# A candidate's raw_json keeps only what is read back from it later: the
+# OpenLibrary LC classifications (Phase 2, apply) and subjects/categories
+# (apply), plus identifying fields. Full responses stay in api_cache.
+_RAW_KEEP_OL = ('key', 'title', 'identifiers', 'classifications', 'subjects')
+_RAW_KEEP_GB = ('title', 'industryIdentifiers', 'categories')
+
+def _raw_json(obj, keep):
+    return _json_dumps({k: obj[k] for k in keep if k in obj})
+
 def query_openlibrary_isbn(isbn):
     data = cached_http_get('ol_isbn', isbn,
         f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data")
@@ -931,7 +1710,7 @@ def query_openlibrary_isbn(isbn):
     cover = book.get('cover', {}).get('medium', '')
     ol_id = book.get('key', '').replace('/works/', '')
     pub_date = book.get('publish_date', '')
-    year = re.search(r'\d{4}', pub_date)
+    year = _YEAR4_RE.search(pub_date)
     publisher = ', '.join(p.get('name', '') for p in book.get('publishers', []))
     return [{
         'source': 'OpenLibrary',
@@ -948,26 +1727,33 @@ def query_openlibrary_isbn(isbn):
         'lc_call_number': '',
         'language': '',
         'page_count': book.get('number_of_pages', 0),
-        'raw_json': json.dumps(book)
+        'raw_json': _raw_json(book, _RAW_KEEP_OL)
     }]
 
+def _trim_google(data):
+    """Keep only the volumes _parse_google reads from a Books API response."""
+    return {'items': data['items'][:5]} if 'items' in data else {}
+
 def query_google_books_isbn(isbn):
     data = cached_http_get('gb_isbn', isbn,
-        _google_url(f"https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn}"))
+        _google_url(f"https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn}&maxResults=5"),
+        trim=_trim_google)
     return _parse_google(data)
 
 def query_google_books_title(title, author=''):
     q = urllib.parse.quote(f"intitle:{title}" + (f"+inauthor:{author}" if author else ''))
     cache_key = f"intitle:{title}" + (f"+inauthor:{author}" if author else '')
     data = cached_http_get('gb_title', cache_key,
-        _google_url(f"https://www.googleapis.com/books/v1/volumes?q={q}&maxResults=5"))
+        _google_url(f"https://www.googleapis.com/books/v1/volumes?q={q}&maxResults=5"),
+        trim=_trim_google)
     return _parse_google(data)
 
 def query_openlibrary_title(title):
     """Search OpenLibrary by title. Returns list of candidates."""
     q = urllib.parse.quote(title)
     data = cached_http_get('ol_title', title,
-        f"https://openlibrary.org/search.json?title={q}&limit=5&fields=key,title,author_name,first_publish_year,publisher,isbn,subject,lcc")
+        f"https://openlibrary.org/search.json?title={q}&limit=5&fields=key,title,author_name,first_publish_year,publisher,isbn,subject,lcc",
+        trim=lambda d: {'docs': d.get('docs', [])[:5]})
     if not data or 'docs' not in data:
         return []
     results = []
@@ -996,7 +1782,7 @@ def query_openlibrary_title(title):
             'lc_call_number': lcc,
             'language': '',
             'page_count': 0,
-            'raw_json': json.dumps(doc)
+            'raw_json': _json_dumps(doc)
         })
     return results
 
@@ -1011,7 +1797,7 @@ def _parse_google(data):
         lc = info.get('categories', [])
         authors = ', '.join(info.get('authors', []))
         pub_date = info.get('publishedDate', '')
-        year = re.search(r'\d{4}', pub_date)
+        year = _YEAR4_RE.search(pub_date)
         results.append({
             'source': 'GoogleBooks',
             'external_id': item.get('id', ''),
@@ -1027,10 +1813,14 @@ def _parse_google(data):
             'lc_call_number': '',
             'language': info.get('language', ''),
             'page_count': info.get('pageCount', 0),
-            'raw_json': json.dumps(info)
+            'raw_json': _raw_json(info, _RAW_KEEP_GB)
         })
     return results
 
+# Filename → title guess: drop bracketed junk like "(2005)" / "[epub]", then separators
+_TITLE_BRACKETS_RE = re.compile(r'[\(\[\{].*?[\)\]\}]')
+_TITLE_SEP_RE      = re.compile(r'[-_\.]+')
+
 def lookup_metadata(isbn13, isbn10, filename):
     """Query all sources and return list of candidate matches."""
     candidates = []
@@ -1045,8 +1835,8 @@ def lookup_metadata(isbn13, isbn10, filename):
         # Fallback: title guess from filename
         stem = Path(filename).stem
         # Remove common junk
-        title_guess = re.sub(r'[\(\[\{].*?[\)\]\}]', '', stem)
-        title_guess = re.sub(r'[-_\.]+', ' ', title_guess).strip()
+        title_guess = _TITLE_BRACKETS_RE.sub('', stem)
+        title_guess = _TITLE_SEP_RE.sub(' ', title_guess).strip()
         candidates += query_google_books_title(title_guess)
         candidates += query_openlibrary_title(title_guess)
     
@@ -1054,6 +1844,151 @@ def lookup_metadata(isbn13, isbn10, filename):
 
 # ─── Scanner ─────────────────────────────────────────────────────────────────
 
+def _probe_scan_file(path, known_sha1s):
+    """
+    Scan worker: hash a file and, unless its content is already registered
+    (unchanged or moved), extract ISBN/LC from it.
+    Returns (sha1, (isbn10, isbn13, lc) or None, text_cache blob or None).
+    """
+    sha1 = sha1_file(path)
+    if sha1 and sha1 in known_sha1s:
+        return sha1, None, None
+    extracted, blob = extract_isbn_cached(path, sha1)
+    return sha1, extracted, blob
+
+# Fill-in-the-blanks assignments for the parsed LC columns, shared by the
+# scanner's UPDATEs; _lc_fill_values() supplies the six parameters in order.
+_LC_FILL_SET = """
+    lc_call_number=COALESCE(NULLIF(lc_call_number,''), ?),
+    lc_class=COALESCE(NULLIF(lc_class,''), ?),
+    lc_number=COALESCE(NULLIF(lc_number,''), ?),
+    lc_cutter=COALESCE(NULLIF(lc_cutter,''), ?),
+    lc_year=COALESCE(NULLIF(lc_year,''), ?),
+    lc_sort=COALESCE(NULLIF(lc_sort,''), ?)"""
+
+_UPDATE_LC_SQL = f"UPDATE books SET {_LC_FILL_SET} WHERE id=?"
+
+_UPDATE_ISBN_LC_SQL = f"""
+    UPDATE books SET isbn=COALESCE(NULLIF(isbn,''),?),
+    isbn13=COALESCE(NULLIF(isbn13,''),?), {_LC_FILL_SET},
+    date_updated=datetime('now') WHERE id=?
+"""
+
+_UPDATE_ENRICHED_SQL = f"""
+    UPDATE books SET
+        title=COALESCE(NULLIF(title,''), ?),
+        author=COALESCE(NULLIF(author,''), ?),
+        publish_year=COALESCE(NULLIF(publish_year,''), ?),
+        publisher=COALESCE(NULLIF(publisher,''), ?),
+        cover_url=COALESCE(NULLIF(cover_url,''), ?),
+        subjects=COALESCE(NULLIF(subjects,''), ?),
+        description=COALESCE(NULLIF(description,''), ?),
+        openlibrary_id=?, google_books_id=?, {_LC_FILL_SET},
+        match_status='auto_matched', match_confidence='high',
+        date_updated=datetime('now')
+    WHERE id=?
+"""
+
+def _lc_fill_values(lc, lc_parts):
+    """Parameters for _LC_FILL_SET: the call number, then its parse_lc() parts."""
+    return (lc, lc_parts.get('lc_class'), lc_parts.get('lc_number'),
+            lc_parts.get('lc_cutter'), lc_parts.get('lc_year'), lc_parts.get('lc_sort'))
+
+_CANDIDATE_INSERT_SQL = """
+    INSERT INTO match_candidates
+    (book_id, source, external_id, title, author, publish_year,
+     publisher, isbn, cover_url, raw_json)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _candidate_rows(book_id, candidates):
+    """match_candidates rows for _CANDIDATE_INSERT_SQL, top 10 only."""
+    return [(book_id, c['source'], c['external_id'], c['title'], c['author'],
+             c['publish_year'], c['publisher'], c['isbn'], c['cover_url'], c['raw_json'])
+            for c in candidates[:10]]
+
+def _apply_enrichment(conn, book_id, candidates, lc_from_api):
+    """Phase 2 write for one book: replace its candidates, fill blanks from the best match."""
+    # An earlier queue entry for the same book may have matched it already
+    if _enrich_skip(conn, book_id):
+        return
+    best = candidates[0]
+    lc_parts = parse_lc(lc_from_api) if lc_from_api else {}
+    conn.execute("DELETE FROM match_candidates WHERE book_id=?", (book_id,))
+    conn.executemany(_CANDIDATE_INSERT_SQL, _candidate_rows(book_id, candidates))
+    conn.execute(_UPDATE_ENRICHED_SQL, (
+        best.get('title'), best.get('author'), best.get('publish_year'),
+        best.get('publisher'), best.get('cover_url'), best.get('subjects'),
+        best.get('description'),
+        best.get('external_id') if best['source'] == 'OpenLibrary' else None,
+        best.get('external_id') if best['source'] == 'GoogleBooks' else None,
+    ) + _lc_fill_values(lc_from_api or None, lc_parts) + (book_id,))
+
+def _walk_files(top):
+    """
+    Yield (path, DirEntry) for every file under top, like os.walk but keeping
+    the DirEntry so its stat() can be reused (free on Windows, where readdir
+    already returns size and mtime). Skips hidden directories and, as os.walk
+    does by default, doesn't follow directory symlinks.
+    """
+    try:
+        with os.scandir(top) as it:
+            entries = list(it)
+    except OSError:
+        return
+    subdirs = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if not is_dir:
+            yield entry.path, entry
+        elif not entry.name.startswith('.') and not entry.is_symlink():
+            subdirs.append(entry.path)
+    for sub in subdirs:
+        yield from _walk_files(sub)
+
+def _enrich_skip(conn, book_id):
+    """True if Phase 2 must leave this book alone (manual edit or already matched)."""
+    row = conn.execute("SELECT match_status, manual_override FROM books WHERE id=?", (book_id,)).fetchone()
+    return bool(row and (row['manual_override'] or row['match_status'] in ('confirmed', 'auto_matched')))
+
+def _enrich_probe(book_id, isbn13, isbn10, fname):
+    """
+    Phase 2 worker: every network call for one book, no writes.
+    Returns (candidates, lc_from_api), or None if nothing was found.
+    """
+    try:
+        candidates = lookup_metadata(isbn13, isbn10, fname)
+    except Exception:
+        candidates = []
+
+    if not candidates:
+        return None
+
+    lc_from_api = None
+    best = candidates[0]
+    try:
+        raw = _json_loads(best.get('raw_json') or '{}')
+        if best['source'] == 'OpenLibrary':
+            lc_list = (raw.get('classifications') or {}).get('lc_classifications') or []
+            if lc_list:
+                lc_from_api = lc_list[0].strip()
+    except Exception:
+        pass
+    if not lc_from_api:
+        try:
+            lc_from_api = query_loc_for_lc_number(isbn13 or isbn10, throttle=True)
+        except Exception:
+            pass
+    if not lc_from_api:
+        try:
+            lc_from_api = query_oclc_classify_for_lc(isbn13 or isbn10)
+        except Exception:
+            pass
+    return candidates, lc_from_api
+
 def scan_library(library_path, rescan=False):
     """
     Two-phase scan:
@@ -1062,16 +1997,14 @@ def scan_library(library_path, rescan=False):
               If not found → delete the book_files row and orphaned books record.
     Phase 1 - Fast: walk filesystem, register every file in DB, extract ISBNs.
               Books appear in UI immediately. No API calls.
-    Phase 2 - Slow: for each book with an ISBN that needs lookup, hit APIs.
-              Can be interrupted; progress is saved after each book.
+    Phase 2 - Slow: for each book with an ISBN that needs lookup, hit APIs
+              (ENRICH_WORKERS books at a time).
+              Can be interrupted; progress is saved every few seconds.
     """
     global SCAN_STATUS
     SCAN_STATUS = {"running": True, "progress": 0, "total": 0, "current": "",
                    "phase": "indexing", "done": False}
 
-    conn = sqlite3.connect(DB_PATH, timeout=15)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
     SCAN_STATUS["phase"] = "cleanup"
     SCAN_STATUS["current"] = "Checking for moved or deleted files…"
 
@@ -1079,333 +2012,501 @@ def scan_library(library_path, rescan=False):
     # Store both raw paths (for DB insertion) and normalized paths (for comparison)
     disk_paths_raw = []  # raw paths as os.path.join produces them
     disk_paths_norm = set()  # normalized for comparison against DB records
-    for root, dirs, files in os.walk(library_path):
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
-        for f in files:
-            ext = Path(f).suffix.lower()
-            if ext in ALL_EXTENSIONS and ext not in IGNORE_EXTENSIONS:
-                raw = os.path.join(root, f)
-                disk_paths_raw.append(raw)
-                disk_paths_norm.add(os.path.normcase(raw))
-
-    # Find DB records whose path isn't on disk
-    # Normalize both sides so slash direction and casing don't cause false mismatches
-    missing_files = []
-    for row in conn.execute("""
-        SELECT bf.id, bf.book_id, bf.file_path, bf.file_name, bf.file_sha1
-        FROM book_files bf
-        JOIN books b ON b.id = bf.book_id
-        WHERE b.is_physical = 0
-    """).fetchall():
-        if os.path.normcase(row['file_path'] or '') not in disk_paths_norm:
-            missing_files.append(dict(row))
-
-    # Phase 1 uses raw paths for DB lookups
-    disk_paths = disk_paths_raw
-
-    if missing_files:
-        # Only compute SHA1s if at least one missing file has a known SHA1
-        # (needed to detect moves vs deletions)
-        missing_with_sha1 = [mf for mf in missing_files if mf.get('file_sha1')]
-        disk_sha1_index = {}
-        if missing_with_sha1:
-            for full in disk_paths:
-                h = sha1_file(full)
-                if h:
-                    disk_sha1_index[h] = full
-
-        for mf in missing_files:
-            old_sha1 = mf.get('file_sha1')
-            new_path = disk_sha1_index.get(old_sha1) if old_sha1 else None
-
-            if new_path:
-                # File moved — update path
-                p = Path(new_path)
-                stat = os.stat(new_path)
-                conn.execute(
-                    "UPDATE book_files SET file_path=?, file_name=?, file_ext=?, "
-                    "file_size=?, file_mtime=? WHERE id=?",
-                    (new_path, p.name, p.suffix.lower(), stat.st_size, stat.st_mtime, mf['id'])
+    disk_entries = {}  # raw path -> DirEntry, whose stat() the later phases reuse
+    for raw, entry in _walk_files(library_path):
+        ext = _file_ext(entry.name)
+        if ext in ALL_EXTENSIONS and ext not in IGNORE_EXTENSIONS:
+            disk_paths_raw.append(raw)
+            disk_paths_norm.add(os.path.normcase(raw))
+            disk_entries[raw] = entry
+
+    # Phase 0/1 take the shared writer one burst at a time (Phase 0's moves and
+    # deletes, then each flush_files() batch), as Phase 2 does, so other writers
+    # only ever wait out one short transaction
+    with ExitStack() as burst:
+        # Find DB records whose path isn't on disk
+        # Normalize both sides so slash direction and casing don't cause false mismatches
+        missing_files = []
+        ro = get_db_ro()
+        try:
+            for row in ro.execute("""
+                SELECT bf.id, bf.book_id, bf.file_path, bf.file_name, bf.file_size, bf.file_sha1
+                FROM book_files bf
+                JOIN books b ON b.id = bf.book_id
+                WHERE b.is_physical = 0
+            """).fetchall():
+                if os.path.normcase(row['file_path'] or '') not in disk_paths_norm:
+                    missing_files.append(dict(row))
+        finally:
+            ro.close()
+
+        # Phase 1 uses raw paths for DB lookups
+        disk_paths = disk_paths_raw
+
+        if missing_files:
+            # Only compute SHA1s if at least one missing file has a known SHA1
+            # (needed to detect moves vs deletions)
+            missing_with_sha1 = [mf for mf in missing_files if mf.get('file_sha1')]
+            disk_sha1_index = {}
+            if missing_with_sha1:
+                # A moved file keeps its size, so only hash disk files whose size
+                # matches a missing one (unless a missing row never recorded it)
+                missing_sizes = {mf['file_size'] for mf in missing_with_sha1}
+                to_hash = disk_paths
+                if None not in missing_sizes:
+                    to_hash = []
+                    for full in disk_paths:
+                        try:
+                            if disk_entries[full].stat().st_size in missing_sizes:
+                                to_hash.append(full)
+                        except OSError:
+                            pass
+                # Hash on the scan pool; map() keeps disk order, so the last
+                # path with a given hash still wins
+                with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+                    for full, h in zip(to_hash, pool.map(sha1_file, to_hash)):
+                        if h:
+                            disk_sha1_index[h] = full
+
+            gone = []  # (book_files.id, book_id) with no matching file on disk
+            with write_db() as conn:
+                for mf in missing_files:
+                    old_sha1 = mf.get('file_sha1')
+                    new_path = disk_sha1_index.get(old_sha1) if old_sha1 else None
+
+                    if new_path:
+                        # File moved — update path
+                        stat = disk_entries[new_path].stat()
+                        conn.execute(
+                            "UPDATE book_files SET file_path=?, file_name=?, file_ext=?, "
+                            "file_size=?, file_mtime=? WHERE id=?",
+                            (new_path, os.path.basename(new_path), _file_ext(new_path),
+                             stat.st_size, stat.st_mtime, mf['id'])
+                        )
+                        conn.execute(
+                            "UPDATE books SET primary_file_path=?, date_updated=datetime('now') "
+                            "WHERE id=? AND (primary_file_path=? OR primary_file_path IS NULL)",
+                            (new_path, mf['book_id'], mf['file_path'])
+                        )
+                    else:
+                        gone.append((mf['id'], mf['book_id']))
+
+                if gone:
+                    # Files gone — delete their book_files rows in one go, then every
+                    # affected book left with no files (and its candidates), set-wise
+                    # through a temp table of the affected book ids
+                    conn.executemany("DELETE FROM book_files WHERE id=?", [(fid,) for fid, _ in gone])
+                    conn.execute("CREATE TEMP TABLE IF NOT EXISTS scan_gone_books (id INTEGER PRIMARY KEY)")
+                    conn.execute("DELETE FROM scan_gone_books")
+                    conn.executemany("INSERT OR IGNORE INTO scan_gone_books (id) VALUES (?)",
+                                     [(bid,) for _, bid in gone])
+                    conn.execute("""
+                        DELETE FROM scan_gone_books
+                        WHERE EXISTS (SELECT 1 FROM book_files bf WHERE bf.book_id = scan_gone_books.id)
+                    """)
+                    conn.execute("DELETE FROM match_candidates WHERE book_id IN (SELECT id FROM scan_gone_books)")
+                    conn.execute("DELETE FROM books WHERE id IN (SELECT id FROM scan_gone_books)")
+
+        # ── Phase 1: filesystem walk + ISBN extraction (fast, no network) ──────────
+        # Reuse disk_paths already collected in Phase 0 — avoid walking network drive twice
+        all_files = sorted(disk_paths)
+
+        SCAN_STATUS["total"] = len(all_files)
+        SCAN_STATUS["phase"] = "indexing"
+
+        needs_lookup = []  # (book_id, isbn13, isbn10, filename)
+        conn = burst.enter_context(write_db())
+
+        # Every book_files row is held in memory, so the per-file lookups
+        # below are dict hits rather than SELECTs. Rows are plain dicts kept in
+        # step with the loop's own writes; the lower-path and sha1 lists may
+        # hold stale entries, which find_* skip by re-checking the row.
+        files_by_path = {}   # file_path -> row
+        files_by_lower = {}  # lower(file_path) -> [rows]
+        files_by_sha1 = {}   # file_sha1 -> [rows]
+        last_file_id = 0
+
+        def index_path(row):
+            files_by_path[row['file_path']] = row
+            files_by_lower.setdefault(row['file_path'].lower(), []).append(row)
+
+        def index_sha1(row):
+            if row['file_sha1']:
+                files_by_sha1.setdefault(row['file_sha1'], []).append(row)
+
+        def load_files():
+            """Index book_files rows added since the last call."""
+            nonlocal last_file_id
+            for r in conn.execute(
+                "SELECT id, book_id, file_path, file_size, file_mtime, file_sha1 "
+                "FROM book_files WHERE id > ? ORDER BY id", (last_file_id,)
+            ):
+                row = dict(r)
+                index_path(row)
+                index_sha1(row)
+                last_file_id = row['id']
+
+        def repath_file(row, new_path):
+            if files_by_path.get(row['file_path']) is row:
+                del files_by_path[row['file_path']]
+            row['file_path'] = new_path
+            index_path(row)
+
+        def find_file(fpath):
+            """Row at fpath, else a case-insensitive match (lowest id) or None."""
+            row = files_by_path.get(fpath)
+            if row is None:
+                key = fpath.lower()
+                live = [r for r in files_by_lower.get(key, ()) if r['file_path'].lower() == key]
+                row = min(live, key=operator.itemgetter('id')) if live else None
+            return row
+
+        def find_moved(sha1, fpath):
+            """Lowest-id row with this content registered under another path."""
+            live = [r for r in files_by_sha1.get(sha1, ())
+                    if r['file_sha1'] == sha1 and r['file_path'] != fpath]
+            return min(live, key=operator.itemgetter('id')) if live else None
+
+        load_files()
+        known = {p.lower(): (r['file_size'], r['file_mtime']) for p, r in files_by_path.items()}
+        known_sha1s = set(files_by_sha1)
+
+        # Hashing and text extraction dominate Phase 1, so start them on a thread
+        # pool for every file that doesn't look unchanged. The loop below still
+        # applies results one file at a time, in order, exactly as before.
+        pool = ThreadPoolExecutor(max_workers=SCAN_WORKERS)
+        prefetch = {}
+        stats = {}  # fpath -> os.stat result, reused by the loop below
+        for fpath in all_files:
+            size, mtime = known.get(fpath.lower(), (None, None))
+            try:
+                st = stats[fpath] = disk_entries[fpath].stat()
+                if size == st.st_size and mtime and abs(float(mtime) - st.st_mtime) < 2:
+                    continue
+            except OSError:
+                pass
+            prefetch[fpath] = pool.submit(_probe_scan_file, fpath, known_sha1s)
+
+        def take_probe(fpath):
+            fut = prefetch.pop(fpath, None)
+            sha1, extracted, blob = fut.result() if fut else (sha1_file(fpath), None, None)
+            if blob:
+                pending_texts.append((sha1, blob))
+            return sha1, extracted
+
+        def extract(fpath, sha1):
+            extracted, blob = extract_isbn_cached(fpath, sha1)
+            if blob:
+                pending_texts.append((sha1, blob))
+            return extracted
+
+        # New book_files rows and size/mtime touches are buffered and written
+        # with executemany, one transaction per batch. Lookups that could match
+        # a buffered row (case-insensitive path, sha1) flush it first.
+        pending_files = []
+        pending_touches = []  # (file_size, file_mtime, book_files.id)
+        pending_paths, pending_sha1s = set(), set()
+        pending_texts = []  # (file_sha1, compressed text) for text_cache
+        last_commit = time.monotonic()
+
+        def flush_files():
+            nonlocal last_commit
+            if pending_files:
+                conn.executemany("""
+                    INSERT OR IGNORE INTO book_files
+                    (book_id, file_path, file_name, file_ext, file_size, file_mtime, file_sha1)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, pending_files)
+                pending_files.clear()
+                load_files()
+                pending_paths.clear()
+                pending_sha1s.clear()
+            if pending_touches:
+                conn.executemany(
+                    "UPDATE book_files SET file_size=?, file_mtime=? WHERE id=?",
+                    pending_touches
                 )
-                conn.execute(
-                    "UPDATE books SET primary_file_path=?, date_updated=datetime('now') "
-                    "WHERE id=? AND (primary_file_path=? OR primary_file_path IS NULL)",
-                    (new_path, mf['book_id'], mf['file_path'])
+                pending_touches.clear()
+                pending_paths.clear()
+            if pending_texts:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO text_cache (file_sha1, extracted_text) VALUES (?, ?)",
+                    pending_texts
                 )
-            else:
-                # File gone — delete book_files row
-                conn.execute("DELETE FROM book_files WHERE id=?", (mf['id'],))
-                # Delete the books record if it has no remaining files
-                remaining = conn.execute(
-                    "SELECT COUNT(*) FROM book_files WHERE book_id=?", (mf['book_id'],)
-                ).fetchone()[0]
-                if remaining == 0:
-                    conn.execute("DELETE FROM match_candidates WHERE book_id=?", (mf['book_id'],))
-                    conn.execute("DELETE FROM books WHERE id=?", (mf['book_id'],))
-
-        conn.commit()
-
-    # ── Phase 1: filesystem walk + ISBN extraction (fast, no network) ──────────
-    # Reuse disk_paths already collected in Phase 0 — avoid walking network drive twice
-    all_files = sorted(disk_paths)
-
-    SCAN_STATUS["total"] = len(all_files)
-    SCAN_STATUS["phase"] = "indexing"
-
-    needs_lookup = []  # (book_id, isbn13, isbn10, filename)
-
-    for i, fpath in enumerate(all_files):
-        SCAN_STATUS["progress"] = i
-        SCAN_STATUS["current"] = os.path.basename(fpath)
-
-        stat = os.stat(fpath)
-        p    = Path(fpath)
-
-        # ── Check if this file path is already in book_files ──────────────
-        existing_file = conn.execute(
-            "SELECT id, book_id, file_size, file_mtime, file_sha1 FROM book_files WHERE file_path=?",
-            (fpath,)
-        ).fetchone()
-        # Fallback: try case-insensitive match in case path casing changed
-        if not existing_file:
-            existing_file = conn.execute(
-                "SELECT id, book_id, file_size, file_mtime, file_sha1 FROM book_files WHERE LOWER(file_path)=LOWER(?)",
-                (fpath,)
-            ).fetchone()
-            if existing_file:
+                pending_texts.clear()
+            # Commit and hand the writer back; sleep(0) lets a waiting writer
+            # take _WRITE_LOCK before this burst's successor does
+            burst.close()
+            time.sleep(0)
+            burst.enter_context(write_db())
+            last_commit = time.monotonic()
+
+        for i, fpath in enumerate(all_files):
+            SCAN_STATUS["progress"] = i
+            SCAN_STATUS["current"] = os.path.basename(fpath)
+
+            if (len(pending_files) + len(pending_touches) >= SCAN_BATCH_ROWS
+                    or time.monotonic() - last_commit >= SCAN_BATCH_SECS
+                    or fpath.lower() in pending_paths):
+                flush_files()
+
+            stat  = stats.pop(fpath, None) or os.stat(fpath)
+            fname = os.path.basename(fpath)
+            fext  = _file_ext(fpath)
+
+            # ── Check if this file path is already in book_files ──────────────
+            # (falls back to a case-insensitive match in case path casing changed)
+            existing_file = find_file(fpath)
+            if existing_file and existing_file['file_path'] != fpath:
                 # Update stored path to current casing
                 conn.execute("UPDATE book_files SET file_path=? WHERE id=?", (fpath, existing_file['id']))
+                repath_file(existing_file, fpath)
 
-        if existing_file:
-            # File already registered — skip if unchanged
-            if (existing_file['file_size'] == stat.st_size and
-                    existing_file['file_mtime'] and
-                    abs(float(existing_file['file_mtime']) - stat.st_mtime) < 2):
-                book_row = conn.execute(
-                    "SELECT id, match_status, isbn13, manual_override FROM books WHERE id=?",
-                    (existing_file['book_id'],)
-                ).fetchone()
-                # Add to Phase 2 queue if unmatched and has an ISBN (rescan retries these)
-                if book_row and book_row['isbn13'] and not book_row['manual_override']:
-                    if book_row['match_status'] == 'unmatched' or (rescan and book_row['match_status'] not in ('confirmed', 'auto_matched')):
-                        needs_lookup.append((book_row['id'], book_row['isbn13'], None, p.name))
-                continue
-            # mtime/size changed — check sha1
-            new_sha1 = sha1_file(fpath)
-            if new_sha1 and existing_file['file_sha1'] and new_sha1 == existing_file['file_sha1']:
+            if existing_file:
+                # File already registered — skip if unchanged
+                if (existing_file['file_size'] == stat.st_size and
+                        existing_file['file_mtime'] and
+                        abs(float(existing_file['file_mtime']) - stat.st_mtime) < 2):
+                    book_row = conn.execute(
+                        "SELECT id, match_status, isbn13, manual_override FROM books WHERE id=?",
+                        (existing_file['book_id'],)
+                    ).fetchone()
+                    # Add to Phase 2 queue if unmatched and has an ISBN (rescan retries these)
+                    if book_row and book_row['isbn13'] and not book_row['manual_override']:
+                        if book_row['match_status'] == 'unmatched' or (rescan and book_row['match_status'] not in ('confirmed', 'auto_matched')):
+                            needs_lookup.append((book_row['id'], book_row['isbn13'], None, fname))
+                    continue
+                # mtime/size changed — check sha1
+                new_sha1, extracted = take_probe(fpath)
+                if new_sha1 and existing_file['file_sha1'] and new_sha1 == existing_file['file_sha1']:
+                    pending_touches.append((stat.st_size, stat.st_mtime, existing_file['id']))
+                    existing_file.update(file_size=stat.st_size, file_mtime=stat.st_mtime)
+                    pending_paths.add(fpath.lower())
+                    continue
+                # Content actually changed — re-extract ISBN/LC, update file record
+                isbn10, isbn13, lc_found = extracted or extract(fpath, new_sha1)
+                lc_parts = parse_lc(lc_found)
                 conn.execute(
-                    "UPDATE book_files SET file_size=?, file_mtime=? WHERE id=?",
-                    (stat.st_size, stat.st_mtime, existing_file['id'])
+                    "UPDATE book_files SET file_size=?, file_mtime=?, file_sha1=? WHERE id=?",
+                    (stat.st_size, stat.st_mtime, new_sha1, existing_file['id'])
                 )
+                existing_file.update(file_size=stat.st_size, file_mtime=stat.st_mtime,
+                                     file_sha1=new_sha1)
+                index_sha1(existing_file)
+                book_id = existing_file['book_id']
+                # Update LC on the book record if we found one
+                if lc_found:
+                    conn.execute(_UPDATE_ISBN_LC_SQL,
+                                 (isbn10, isbn13) + _lc_fill_values(lc_found, lc_parts) + (book_id,))
+                if isbn13:
+                    needs_lookup.append((book_id, isbn13, isbn10, fname))
                 continue
-            # Content actually changed — re-extract ISBN/LC, update file record
-            isbn10, isbn13, lc_found = extract_isbn_from_file(fpath)
+
+            # ── New file path — extract ISBN/LC ───────────────────────────────
+            new_sha1, extracted = take_probe(fpath)
+            if new_sha1 in pending_sha1s:
+                flush_files()
+
+            # Check if same content exists under a different path (rename/move)
+            if new_sha1:
+                moved_file = find_moved(new_sha1, fpath)
+                if moved_file:
+                    conn.execute(
+                        "UPDATE book_files SET file_path=?, file_name=?, file_ext=?, "
+                        "file_size=?, file_mtime=? WHERE id=?",
+                        (fpath, fname, fext, stat.st_size, stat.st_mtime, moved_file['id'])
+                    )
+                    repath_file(moved_file, fpath)
+                    moved_file.update(file_size=stat.st_size, file_mtime=stat.st_mtime)
+                    continue
+
+            isbn10, isbn13, lc_found = extracted or extract(fpath, new_sha1)
             lc_parts = parse_lc(lc_found)
-            conn.execute(
-                "UPDATE book_files SET file_size=?, file_mtime=?, file_sha1=? WHERE id=?",
-                (stat.st_size, stat.st_mtime, new_sha1, existing_file['id'])
-            )
-            book_id = existing_file['book_id']
-            # Update LC on the book record if we found one
-            if lc_found:
-                conn.execute("""
-                    UPDATE books SET isbn=COALESCE(NULLIF(isbn,''),?),
-                    isbn13=COALESCE(NULLIF(isbn13,''),?),
-                    lc_call_number=COALESCE(NULLIF(lc_call_number,''), ?),
-                    lc_class=COALESCE(NULLIF(lc_class,''), ?),
-                    lc_number=COALESCE(NULLIF(lc_number,''), ?),
-                    lc_cutter=COALESCE(NULLIF(lc_cutter,''), ?),
-                    lc_year=COALESCE(NULLIF(lc_year,''), ?),
-                    lc_sort=COALESCE(NULLIF(lc_sort,''), ?),
-                    date_updated=datetime('now') WHERE id=?
-                """, (isbn10, isbn13, lc_found,
+
+            # ── Find or create the book record ────────────────────────────────
+            book_id = None
+            if isbn13:
+                # Does a book with this ISBN already exist? (duplicate format)
+                existing_book = conn.execute(
+                    "SELECT id, match_status FROM books WHERE isbn13=? AND is_physical=0",
+                    (isbn13,)
+                ).fetchone()
+                if existing_book:
+                    book_id = existing_book['id']
+                    # Update LC on existing book if we have it and it doesn't yet
+                    if lc_found:
+                        conn.execute(_UPDATE_LC_SQL,
+                                     _lc_fill_values(lc_found, lc_parts) + (book_id,))
+
+            if book_id is None:
+                # Create new book record
+                cur = conn.execute("""
+                    INSERT INTO books
+                    (isbn, isbn13, lc_call_number, lc_class, lc_number, lc_cutter, lc_year, lc_sort)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (isbn10, isbn13,
+                      lc_found or None,
                       lc_parts.get('lc_class'), lc_parts.get('lc_number'),
                       lc_parts.get('lc_cutter'), lc_parts.get('lc_year'),
-                      lc_parts.get('lc_sort'), book_id))
-            if isbn13:
-                needs_lookup.append((book_id, isbn13, isbn10, p.name))
-            continue
-
-        # ── New file path — extract ISBN/LC ───────────────────────────────
-        new_sha1 = sha1_file(fpath)
+                      lc_parts.get('lc_sort')))
+                book_id = cur.lastrowid
 
-        # Check if same content exists under a different path (rename/move)
-        if new_sha1:
-            moved_file = conn.execute(
-                "SELECT id, book_id FROM book_files WHERE file_sha1=? AND file_path!=?",
-                (new_sha1, fpath)
-            ).fetchone()
-            if moved_file:
-                conn.execute(
-                    "UPDATE book_files SET file_path=?, file_name=?, file_ext=?, "
-                    "file_size=?, file_mtime=? WHERE id=?",
-                    (fpath, p.name, p.suffix.lower(), stat.st_size, stat.st_mtime, moved_file['id'])
-                )
-                if i % 50 == 0:
-                    conn.commit()
-                continue
+            # ── Register this file in book_files (buffered) ──────────────────
+            pending_files.append((book_id, fpath, fname, fext,
+                                  stat.st_size, stat.st_mtime, new_sha1))
+            pending_paths.add(fpath.lower())
+            if new_sha1:
+                pending_sha1s.add(new_sha1)
 
-        isbn10, isbn13, lc_found = extract_isbn_from_file(fpath)
-        lc_parts = parse_lc(lc_found)
+            # Update primary_file_path if not set (prefer epub over pdf, etc.)
+            conn.execute("""
+                UPDATE books SET primary_file_path=?
+                WHERE id=? AND (primary_file_path IS NULL OR primary_file_path='')
+            """, (fpath, book_id))
 
-        # ── Find or create the book record ────────────────────────────────
-        book_id = None
-        if isbn13:
-            # Does a book with this ISBN already exist? (duplicate format)
-            existing_book = conn.execute(
-                "SELECT id, match_status FROM books WHERE isbn13=? AND is_physical=0",
-                (isbn13,)
-            ).fetchone()
-            if existing_book:
-                book_id = existing_book['id']
-                # Update LC on existing book if we have it and it doesn't yet
-                if lc_found:
-                    conn.execute("""
-                        UPDATE books SET
-                        lc_call_number=COALESCE(NULLIF(lc_call_number,''), ?),
-                        lc_class=COALESCE(NULLIF(lc_class,''), ?),
-                        lc_number=COALESCE(NULLIF(lc_number,''), ?),
-                        lc_cutter=COALESCE(NULLIF(lc_cutter,''), ?),
-                        lc_year=COALESCE(NULLIF(lc_year,''), ?),
-                        lc_sort=COALESCE(NULLIF(lc_sort,''), ?)
-                        WHERE id=?
-                    """, (lc_found,
-                          lc_parts.get('lc_class'), lc_parts.get('lc_number'),
-                          lc_parts.get('lc_cutter'), lc_parts.get('lc_year'),
-                          lc_parts.get('lc_sort'), book_id))
-
-        if book_id is None:
-            # Create new book record
-            cur = conn.execute("""
-                INSERT INTO books
-                (isbn, isbn13, lc_call_number, lc_class, lc_number, lc_cutter, lc_year, lc_sort)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (isbn10, isbn13,
-                  lc_found or None,
-                  lc_parts.get('lc_class'), lc_parts.get('lc_number'),
-                  lc_parts.get('lc_cutter'), lc_parts.get('lc_year'),
-                  lc_parts.get('lc_sort')))
-            book_id = cur.lastrowid
-
-        # ── Register this file in book_files ─────────────────────────────
-        conn.execute("""
-            INSERT OR IGNORE INTO book_files
-            (book_id, file_path, file_name, file_ext, file_size, file_mtime, file_sha1)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (book_id, fpath, p.name, p.suffix.lower(), stat.st_size, stat.st_mtime, new_sha1))
-
-        # Update primary_file_path if not set (prefer epub over pdf, etc.)
-        conn.execute("""
-            UPDATE books SET primary_file_path=?
-            WHERE id=? AND (primary_file_path IS NULL OR primary_file_path='')
-        """, (fpath, book_id))
-
-        if isbn13:
-            needs_lookup.append((book_id, isbn13, isbn10, p.name))
-
-        if i % 50 == 0:
-            conn.commit()
+            if isbn13:
+                needs_lookup.append((book_id, isbn13, isbn10, fname))
 
-    conn.commit()
+        # Anything still queued was predicted as changed but turned out not to need it
+        for fut in prefetch.values():
+            fut.cancel()
+        pool.shutdown()
+        flush_files()
 
-    # ── Phase 2: API lookups (network, one book at a time) ────────────────────
+    # ── Phase 2: API lookups (network, several books at a time) ──────────────
     SCAN_STATUS["phase"] = "enriching"
     SCAN_STATUS["progress"] = 0
     SCAN_STATUS["total"] = len(needs_lookup)
 
-    for i, (book_id, isbn13, isbn10, fname) in enumerate(needs_lookup):
+    # Books already manually overridden or matched are found up front, one
+    # query per chunk of ids, and never reach the lookup pool
+    skip = set()
+    book_ids = list({item[0] for item in needs_lookup})
+    conn = get_db_ro()
+    try:
+        for n in range(0, len(book_ids), 500):
+            chunk = book_ids[n:n + 500]
+            skip.update(r[0] for r in conn.execute(
+                f"SELECT id FROM books WHERE id IN ({','.join('?' * len(chunk))}) "
+                "AND (manual_override OR match_status IN ('confirmed', 'auto_matched'))",
+                chunk))
+    finally:
+        conn.close()
+
+    # Lookups run ENRICH_WORKERS at a time; results are applied below in queue
+    # order. Writes are batched: one write_db() burst per ENRICH_BATCH_BOOKS
+    # found books, or per SCAN_BATCH_SECS, whichever comes first.
+    pool = ThreadPoolExecutor(max_workers=ENRICH_WORKERS)
+    lookups = [None if item[0] in skip else pool.submit(_enrich_probe, *item)
+               for item in needs_lookup]
+    enriched = []  # (book_id, candidates, lc_from_api) awaiting a write
+    last_write = time.monotonic()
+
+    def write_enriched():
+        nonlocal last_write
+        if enriched:
+            def flush():
+                with write_db() as conn:
+                    for item in enriched:
+                        _apply_enrichment(conn, *item)
+            _retry_locked(flush)
+            enriched.clear()
+        last_write = time.monotonic()
+
+    for i, ((book_id, isbn13, isbn10, fname), fut) in enumerate(zip(needs_lookup, lookups)):
         SCAN_STATUS["progress"] = i
         SCAN_STATUS["current"] = fname
 
-        # Skip if already manually overridden or matched
-        row = conn.execute("SELECT match_status, manual_override FROM books WHERE id=?", (book_id,)).fetchone()
-        if row and (row['manual_override'] or row['match_status'] in ('confirmed', 'auto_matched')):
-            continue
+        found = fut.result() if fut else None
+        if found:
+            enriched.append((book_id,) + found)
+        if (len(enriched) >= ENRICH_BATCH_BOOKS
+                or time.monotonic() - last_write >= SCAN_BATCH_SECS):
+            write_enriched()
+    write_enriched()
 
-        # ── Do all network calls BEFORE touching the DB connection ──
-        try:
-            candidates = lookup_metadata(isbn13, isbn10, fname)
-        except Exception:
-            candidates = []
+    pool.shutdown()
+    SCAN_STATUS["progress"] = len(needs_lookup)
+    finalize_scan()
+    SCAN_STATUS["done"] = True
+    SCAN_STATUS["running"] = False
 
-        if not candidates:
-            continue
 
-        lc_from_api = None
-        best = candidates[0]
+# ─── LC Re-extraction ────────────────────────────────────────────────────────
+
+LC_STATUS = {"running": False, "done": False, "progress": 0, "total": 0, "current": ""}
+
+def _ol_work_lc(ol_id):
+    """
+    LC call number from an OpenLibrary work, or failing that from one of its
+    first five editions. Both documents are cached, cut down to their
+    lc_classifications.
+    """
+    works_data = cached_http_get('ol_works', ol_id,
+        f"https://openlibrary.org/works/{ol_id}.json",
+        trim=lambda d: {'lc_classifications': d.get('lc_classifications', [])})
+    if works_data:
+        lc_list = works_data.get('lc_classifications', [])
+        if lc_list and lc_list[0].strip():
+            return lc_list[0].strip()
+    eds = cached_http_get('ol_editions', ol_id,
+        f"https://openlibrary.org/works/{ol_id}/editions.json?limit=5",
+        trim=lambda d: {'entries': [{'lc_classifications': ed.get('lc_classifications', [])}
+                                    for ed in d.get('entries', [])]})
+    if eds:
+        for ed in eds.get('entries', []):
+            lc_list = ed.get('lc_classifications', [])
+            if lc_list:
+                return lc_list[0].strip()
+    return None
+
+def _lookup_lc(row):
+    """
+    Find an LC call number for one run_lc_reextract() row. Runs on a worker
+    thread and only reads from the network/cache; returns (lc, new_ol_id).
+    """
+    # 1. Try OpenLibrary Works API if we already have an OL ID
+    lc = None
+    if not lc and row["openlibrary_id"]:
         try:
-            raw = json.loads(best.get('raw_json') or '{}')
-            if best['source'] == 'OpenLibrary':
-                lc_list = (raw.get('classifications') or {}).get('lc_classifications') or []
-                if lc_list:
-                    lc_from_api = lc_list[0].strip()
+            lc = _ol_work_lc(row["openlibrary_id"])
         except Exception:
             pass
-        if not lc_from_api:
+
+    # 2b. If no OL ID but we have an ISBN, query OpenLibrary by ISBN to find OL ID + LC
+    new_ol_id = None
+    if not lc:
+        isbn = row["isbn13"] or row["isbn"]
+        if isbn:
             try:
-                lc_from_api = query_loc_for_lc_number(isbn13 or isbn10)
+                ol_candidates = query_openlibrary_isbn(isbn)
+                if ol_candidates:
+                    ol_id = ol_candidates[0].get('external_id', '')
+                    if ol_id:
+                        new_ol_id = ol_id
+                        lc = _ol_work_lc(ol_id)
             except Exception:
                 pass
-        if not lc_from_api:
+
+    # 3. Try LOC SRU by ISBN
+    if not lc:
+        isbn = row["isbn13"] or row["isbn"]
+        if isbn:
             try:
-                lc_from_api = query_oclc_classify_for_lc(isbn13 or isbn10)
+                lc = query_loc_for_lc_number(isbn, throttle=True)
             except Exception:
                 pass
 
-        lc_parts = parse_lc(lc_from_api) if lc_from_api else {}
-
-        # ── Now write to DB in a short burst ──
-        conn.execute("DELETE FROM match_candidates WHERE book_id=?", (book_id,))
-        for c in candidates[:10]:
-            conn.execute("""
-                INSERT INTO match_candidates
-                (book_id, source, external_id, title, author, publish_year,
-                 publisher, isbn, cover_url, raw_json)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (book_id, c['source'], c['external_id'], c['title'], c['author'],
-                  c['publish_year'], c['publisher'], c['isbn'], c['cover_url'], c['raw_json']))
-        conn.execute("""
-            UPDATE books SET
-                title=COALESCE(NULLIF(title,''), ?),
-                author=COALESCE(NULLIF(author,''), ?),
-                publish_year=COALESCE(NULLIF(publish_year,''), ?),
-                publisher=COALESCE(NULLIF(publisher,''), ?),
-                cover_url=COALESCE(NULLIF(cover_url,''), ?),
-                subjects=COALESCE(NULLIF(subjects,''), ?),
-                description=COALESCE(NULLIF(description,''), ?),
-                openlibrary_id=?, google_books_id=?,
-                lc_call_number=COALESCE(NULLIF(lc_call_number,''), ?),
-                lc_class=COALESCE(NULLIF(lc_class,''), ?),
-                lc_number=COALESCE(NULLIF(lc_number,''), ?),
-                lc_cutter=COALESCE(NULLIF(lc_cutter,''), ?),
-                lc_year=COALESCE(NULLIF(lc_year,''), ?),
-                lc_sort=COALESCE(NULLIF(lc_sort,''), ?),
-                match_status='auto_matched', match_confidence='high',
-                date_updated=datetime('now')
-            WHERE id=?
-        """, (
-            best.get('title'), best.get('author'), best.get('publish_year'),
-            best.get('publisher'), best.get('cover_url'), best.get('subjects'),
-            best.get('description'),
-            best.get('external_id') if best['source'] == 'OpenLibrary' else None,
-            best.get('external_id') if best['source'] == 'GoogleBooks' else None,
-            lc_from_api or None,
-            lc_parts.get('lc_class'), lc_parts.get('lc_number'),
-            lc_parts.get('lc_cutter'), lc_parts.get('lc_year'),
-            lc_parts.get('lc_sort'),
-            book_id
-        ))
-        conn.commit()
-
-    SCAN_STATUS["progress"] = len(needs_lookup)
-    SCAN_STATUS["done"] = True
-    SCAN_STATUS["running"] = False
-    conn.close()
-
-
-# ─── LC Re-extraction ────────────────────────────────────────────────────────
+    # 4. Try OCLC Classify by ISBN
+    if not lc:
+        isbn = row["isbn13"] or row["isbn"]
+        if isbn:
+            try:
+                lc = query_oclc_classify_for_lc(isbn)
+            except Exception:
+                pass
 
-LC_STATUS = {"running": False, "done": False, "progress": 0, "total": 0, "current": ""}
+    return lc, new_ol_id
 
 def run_lc_reextract():
     """Re-extract LC call numbers from file contents for all books missing one."""
@@ -1413,9 +2514,7 @@ def run_lc_reextract():
     LC_STATUS = {"running": True, "done": False, "progress": 0, "total": 0, "current": ""}
 
     # Fetch the work list then immediately close the connection
-    conn = sqlite3.connect(DB_PATH, timeout=15)
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.row_factory = sqlite3.Row
+    conn = get_db_ro()
     rows = [dict(r) for r in conn.execute("""
         SELECT b.id, bf.file_path, bf.file_ext, b.isbn13, b.isbn, b.openlibrary_id
         FROM books b
@@ -1432,111 +2531,72 @@ def run_lc_reextract():
     tried = 0
     no_isbn = sum(1 for r in rows if not r.get('isbn13') and not r.get('isbn'))
 
-    for i, row in enumerate(rows):
-        LC_STATUS["progress"] = i
-        LC_STATUS["tried"] = tried
-        LC_STATUS["updated"] = updated
-        fname = row["file_path"] or ''
-        LC_STATUS["current"] = os.path.basename(fname)
-
-        isbn = row["isbn13"] or row["isbn"]
-        if not isbn and not row["openlibrary_id"]:
-            continue  # nothing to query with
-        tried += 1
-
-        # 1. Try OpenLibrary Works API if we already have an OL ID
-        lc = None
-        if not lc and row["openlibrary_id"]:
-            try:
-                ol_id = row["openlibrary_id"]
-                works_data = http_get(f"https://openlibrary.org/works/{ol_id}.json")
-                if works_data:
-                    lc_list = works_data.get('lc_classifications', [])
-                    if lc_list:
-                        lc = lc_list[0].strip()
-                if not lc:
-                    eds = http_get(f"https://openlibrary.org/works/{ol_id}/editions.json?limit=5")
-                    if eds:
-                        for ed in eds.get('entries', []):
-                            lc_list = ed.get('lc_classifications', [])
-                            if lc_list:
-                                lc = lc_list[0].strip()
-                                break
-            except Exception:
-                pass
-
-        # 2b. If no OL ID but we have an ISBN, query OpenLibrary by ISBN to find OL ID + LC
-        new_ol_id = None
-        if not lc:
-            isbn = row["isbn13"] or row["isbn"]
-            if isbn:
-                try:
-                    ol_candidates = query_openlibrary_isbn(isbn)
-                    if ol_candidates:
-                        ol_id = ol_candidates[0].get('external_id', '')
-                        if ol_id:
-                            new_ol_id = ol_id
-                            works_data = http_get(f"https://openlibrary.org/works/{ol_id}.json")
-                            if works_data:
-                                lc_list = works_data.get('lc_classifications', [])
-                                if lc_list:
-                                    lc = lc_list[0].strip()
-                            if not lc:
-                                eds = http_get(f"https://openlibrary.org/works/{ol_id}/editions.json?limit=5")
-                                if eds:
-                                    for ed in eds.get('entries', []):
-                                        lc_list = ed.get('lc_classifications', [])
-                                        if lc_list:
-                                            lc = lc_list[0].strip()
-                                            break
-                except Exception:
-                    pass
-
-        # 3. Try LOC SRU by ISBN
-        if not lc:
-            isbn = row["isbn13"] or row["isbn"]
-            if isbn:
-                try:
-                    lc = query_loc_for_lc_number(isbn)
-                except Exception:
-                    pass
-
-        # 4. Try OCLC Classify by ISBN
-        if not lc:
-            isbn = row["isbn13"] or row["isbn"]
-            if isbn:
-                try:
-                    lc = query_oclc_classify_for_lc(isbn)
-                except Exception:
-                    pass
-
-        # Write result — open a short-lived connection so we don't block other writers
-        if lc or new_ol_id:
-            try:
-                wconn = sqlite3.connect(DB_PATH, timeout=15)
-                wconn.execute("PRAGMA journal_mode=WAL")
-                if new_ol_id:
-                    wconn.execute(
+    # Results are written in batches on the shared writer, so other writers
+    # only ever wait out one short transaction
+    ol_updates = []  # (openlibrary_id, book id)
+    lc_updates = []  # (lc_call_number, lc_class, lc_number, lc_cutter, lc_year, lc_sort, book id)
+    last_write = time.monotonic()
+
+    def write_updates():
+        nonlocal last_write, updated
+        if ol_updates or lc_updates:
+            def flush():
+                with write_db() as wconn:
+                    wconn.executemany(
                         "UPDATE books SET openlibrary_id=? WHERE id=? AND (openlibrary_id IS NULL OR openlibrary_id='')",
-                        (new_ol_id, row["id"])
+                        ol_updates
                     )
-                if lc:
-                    lc_parts = parse_lc(lc)
-                    wconn.execute("""
+                    wconn.executemany("""
                         UPDATE books SET
                             lc_call_number=?, lc_class=?, lc_number=?,
                             lc_cutter=?, lc_year=?, lc_sort=?,
                             date_updated=datetime('now')
                         WHERE id=?
-                    """, (lc, lc_parts.get('lc_class'), lc_parts.get('lc_number'),
-                          lc_parts.get('lc_cutter'), lc_parts.get('lc_year'),
-                          lc_parts.get('lc_sort'), row["id"]))
-                    updated += 1
-                wconn.commit()
-                wconn.close()
-            except Exception:
-                pass
+                    """, lc_updates)
+            try:
+                _retry_locked(flush)
+            except sqlite3.Error as e:
+                # Keep the batch; the next flush writes it along with new rows
+                app.logger.warning("LC batch write failed, %d rows kept for retry: %s",
+                                   len(ol_updates) + len(lc_updates), e)
+                LC_STATUS["write_errors"] = LC_STATUS.get("write_errors", 0) + 1
+            else:
+                updated += len(lc_updates)
+                ol_updates.clear()
+                lc_updates.clear()
+        last_write = time.monotonic()
+
+    # Lookups run ENRICH_WORKERS at a time and are consumed in queue order
+    pool = ThreadPoolExecutor(max_workers=ENRICH_WORKERS)
+    lookups = [pool.submit(_lookup_lc, row)
+               if row["isbn13"] or row["isbn"] or row["openlibrary_id"] else None
+               for row in rows]
+
+    for i, (row, fut) in enumerate(zip(rows, lookups)):
+        LC_STATUS["progress"] = i
+        LC_STATUS["tried"] = tried
+        LC_STATUS["updated"] = updated
+        fname = row["file_path"] or ''
+        LC_STATUS["current"] = os.path.basename(fname)
 
+        if fut is None:
+            continue  # nothing to query with
+        tried += 1
+        lc, new_ol_id = fut.result()
+
+        # Queue the result for the next batched write
+        if new_ol_id:
+            ol_updates.append((new_ol_id, row["id"]))
+        if lc:
+            lc_updates.append(_lc_fill_values(lc, parse_lc(lc)) + (row["id"],))
+        if (len(ol_updates) + len(lc_updates) >= ENRICH_BATCH_BOOKS
+                or time.monotonic() - last_write >= SCAN_BATCH_SECS):
+            write_updates()
+    write_updates()
+    if lc_updates:
+        LC_STATUS["unwritten"] = len(lc_updates)
+
+    pool.shutdown()
     LC_STATUS["running"] = False
     LC_STATUS["done"] = True
     LC_STATUS["progress"] = len(rows)
@@ -1554,6 +2614,10 @@ def api_lc_status():
     return jsonify(LC_STATUS)
 
 
+# Columns a merge copies onto the surviving record where it has none
+_MERGE_FILL_COLS = ('title', 'author', 'publish_year', 'publisher', 'cover_url', 'subjects',
+                    'lc_call_number', 'lc_class', 'lc_number', 'lc_cutter', 'lc_year', 'lc_sort')
+
 def try_merge_into_existing(db, book_id, isbn13):
     """
     If another book record already has isbn13, merge book_id into it:
@@ -1582,27 +2646,19 @@ def try_merge_into_existing(db, book_id, isbn13):
     # Delete any remaining book_files rows that couldn't move (exact duplicates)
     db.execute("DELETE FROM book_files WHERE book_id=?", (book_id,))
 
-    # Merge metadata: fill in any blanks on target from source
-    db.execute("""
+    # Merge metadata: fill in any blanks on target from source, read once
+    src = db.execute(
+        f"SELECT {', '.join(_MERGE_FILL_COLS)}, match_status FROM books WHERE id=?",
+        (book_id,)
+    ).fetchone()
+    db.execute(f"""
         UPDATE books SET
-            title        = COALESCE(NULLIF(title,''),        (SELECT title        FROM books WHERE id=?)),
-            author       = COALESCE(NULLIF(author,''),       (SELECT author       FROM books WHERE id=?)),
-            publish_year = COALESCE(NULLIF(publish_year,''), (SELECT publish_year FROM books WHERE id=?)),
-            publisher    = COALESCE(NULLIF(publisher,''),    (SELECT publisher    FROM books WHERE id=?)),
-            cover_url    = COALESCE(NULLIF(cover_url,''),    (SELECT cover_url    FROM books WHERE id=?)),
-            subjects     = COALESCE(NULLIF(subjects,''),     (SELECT subjects     FROM books WHERE id=?)),
-            lc_call_number = COALESCE(NULLIF(lc_call_number,''), (SELECT lc_call_number FROM books WHERE id=?)),
-            lc_class     = COALESCE(NULLIF(lc_class,''),    (SELECT lc_class     FROM books WHERE id=?)),
-            lc_number    = COALESCE(NULLIF(lc_number,''),   (SELECT lc_number    FROM books WHERE id=?)),
-            lc_cutter    = COALESCE(NULLIF(lc_cutter,''),   (SELECT lc_cutter    FROM books WHERE id=?)),
-            lc_year      = COALESCE(NULLIF(lc_year,''),     (SELECT lc_year      FROM books WHERE id=?)),
-            lc_sort      = COALESCE(NULLIF(lc_sort,''),     (SELECT lc_sort      FROM books WHERE id=?)),
+            {', '.join(f"{c} = COALESCE(NULLIF({c},''), ?)" for c in _MERGE_FILL_COLS)},
             match_status = CASE WHEN match_status IN ('confirmed','auto_matched')
-                           THEN match_status
-                           ELSE (SELECT match_status FROM books WHERE id=?) END,
+                           THEN match_status ELSE ? END,
             date_updated = datetime('now')
         WHERE id=?
-    """, [book_id]*13 + [target_id])
+    """, (tuple(src) if src else (None,) * (len(_MERGE_FILL_COLS) + 1)) + (target_id,))
 
     # Clean up the redundant record
     db.execute("DELETE FROM match_candidates WHERE book_id=?", (book_id,))
@@ -1612,6 +2668,16 @@ def try_merge_into_existing(db, book_id, isbn13):
 
 # ─── Routes ──────────────────────────────────────────────────────────────────
 
+def _encode_json(obj):
+    """Response JSON as bytes, sorted and compact like jsonify; orjson when installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def _json_response(obj):
+    """jsonify() for the large book payloads."""
+    return app.response_class(_encode_json(obj), mimetype='application/json')
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -1658,13 +2724,11 @@ def api_test_google():
     """Diagnostic: test Google Books API and return raw response info."""
     url = _google_url("https://www.googleapis.com/books/v1/volumes?q=intitle:hamlet&maxResults=1")
     try:
-        req = urllib.request.Request(url, headers={'User-Agent': 'BookMeta/1.0'})
-        with urllib.request.urlopen(req, timeout=6) as resp:
-            raw = resp.read().decode('utf-8')
-            data = json.loads(raw)
-            items = len(data.get('items', []))
-            return jsonify({"ok": True, "items": items, "has_key": bool(_get_google_api_key()),
-                           "error": data.get('error', {}).get('message', '') if 'error' in data else ''})
+        raw = http_fetch(url).decode('utf-8')
+        data = json.loads(raw)
+        items = len(data.get('items', []))
+        return jsonify({"ok": True, "items": items, "has_key": bool(_get_google_api_key()),
+                       "error": data.get('error', {}).get('message', '') if 'error' in data else ''})
     except urllib.error.HTTPError as e:
         body = e.read().decode('utf-8', errors='replace')
         return jsonify({"ok": False, "status": e.code, "body": body[:300], "has_key": bool(_get_google_api_key())})
@@ -1674,14 +2738,15 @@ def api_test_google():
 @app.route('/api/stats')
 def api_stats():
     db = get_db()
-    total = db.execute("SELECT COUNT(*) FROM books").fetchone()[0]
-    matched = db.execute("SELECT COUNT(*) FROM books WHERE match_status != 'unmatched'").fetchone()[0]
-    unmatched = db.execute("SELECT COUNT(*) FROM books WHERE match_status = 'unmatched'").fetchone()[0]
-    needs_review = db.execute("SELECT COUNT(*) FROM books WHERE match_status = 'needs_review'").fetchone()[0]
-    auto_matched = db.execute("SELECT COUNT(*) FROM books WHERE match_status = 'auto_matched'").fetchone()[0]
-    confirmed = db.execute("SELECT COUNT(*) FROM books WHERE match_status = 'confirmed'").fetchone()[0]
-    return jsonify({"total": total, "matched": matched, "unmatched": unmatched,
-                    "needs_review": needs_review, "auto_matched": auto_matched, "confirmed": confirmed})
+    # One pass over idx_books_match_status; NULL statuses count only in total
+    counts = dict(db.execute(
+        "SELECT match_status, COUNT(*) FROM books GROUP BY match_status"
+    ).fetchall())
+    total = sum(counts.values())
+    unmatched = counts.get('unmatched', 0)
+    return jsonify({"total": total, "matched": total - unmatched - counts.get(None, 0),
+                    "unmatched": unmatched, "needs_review": counts.get('needs_review', 0),
+                    "auto_matched": counts.get('auto_matched', 0), "confirmed": counts.get('confirmed', 0)})
 
 @app.route('/api/scan', methods=['POST'])
 def api_scan():
@@ -1700,6 +2765,23 @@ def api_scan():
 def api_scan_status():
     return jsonify(SCAN_STATUS)
 
+# /api/books?lc_range=: class letters, then an optional class-number prefix
+_LC_RANGE_RE = re.compile(r'([A-Z]{1,3})(\d*)')
+
+# Book list ORDER BY per ?sort=. COLLATE NOCASE orders exactly like LOWER()
+# (both fold ASCII only) without building a lowered copy of every key. Only
+# values are bound, so each filter/sort combination is one fixed SQL string
+# that a pooled connection's statement cache keeps parsed.
+_BOOK_SORTS = {
+    'date_added': "COALESCE(b.date_added, '') DESC, b.id DESC",
+    'title':      'COALESCE(b.title, (SELECT bf.file_name FROM book_files bf WHERE bf.book_id=b.id LIMIT 1)) COLLATE NOCASE ASC',
+    'author':     'COALESCE(b.author,"") COLLATE NOCASE ASC, COALESCE(b.title,"") COLLATE NOCASE ASC',
+    'year':       'b.publish_year DESC, COALESCE(b.title,"") COLLATE NOCASE ASC',
+    'lc':         "COALESCE(b.lc_sort,'ZZZZZZ') ASC",
+    'read':       'b.date_read DESC NULLS LAST',
+    'rating':     'b.rating DESC NULLS LAST, COALESCE(b.title,"") COLLATE NOCASE ASC',
+}
+
 @app.route('/api/books')
 def api_books():
     db = get_db()
@@ -1730,8 +2812,7 @@ def api_books():
     if lc_range:
         # LC range browsing: "PQ2" -> PQ2xx, "HM" -> all HM, "PN8" -> PN8xx
         # Strategy: filter on lc_class match + numeric range on lc_number
-        import re as _re
-        _m = _re.match(r'([A-Z]{1,3})(\d*)', lc_range)
+        _m = _LC_RANGE_RE.match(lc_range)
         if _m:
             cls, num_prefix = _m.group(1), _m.group(2)
             if not num_prefix:
@@ -1740,63 +2821,96 @@ def api_books():
                 params.append(cls)
             else:
                 # Class + number prefix — "BF4" -> lc_number starts with "4"
-                # "BF41" -> lc_number starts with "41", "PQ2" -> starts with "2"
-                where.append("b.lc_class = ? AND b.lc_number LIKE ?")
-                params.extend([cls, num_prefix + '%'])
+                # "BF41" -> lc_number starts with "41", "PQ2" -> starts with "2".
+                # Written as the range [prefix, prefix with its last digit
+                # bumped) so idx_books_lc_class can seek it; LIKE cannot use
+                # the index
+                where.append("b.lc_class = ? AND b.lc_number >= ? AND b.lc_number < ?")
+                params.extend([cls, num_prefix, num_prefix[:-1] + chr(ord(num_prefix[-1]) + 1)])
     if search:
-        where.append("(b.title LIKE ? OR b.author LIKE ? OR EXISTS(SELECT 1 FROM book_files bf WHERE bf.book_id=b.id AND bf.file_name LIKE ?) OR b.isbn13 LIKE ? OR b.subjects LIKE ? OR b.lc_call_number LIKE ?)")
-        params += [f'%{search}%'] * 6
+        if FTS_AVAILABLE and len(search) >= 3:
+            # Substring match from the trigram index, as one quoted phrase
+            where.append("b.id IN (SELECT rowid FROM books_fts WHERE books_fts MATCH ?)")
+            params.append('"' + search.replace('"', '""') + '"')
+        else:
+            where.append("(b.title LIKE ? OR b.author LIKE ? OR EXISTS(SELECT 1 FROM book_files bf WHERE bf.book_id=b.id AND bf.file_name LIKE ?) OR b.isbn13 LIKE ? OR b.subjects LIKE ? OR b.lc_call_number LIKE ?)")
+            params += [f'%{search}%'] * 6
 
     where_clause = ("WHERE " + " AND ".join(where)) if where else ""
 
-    # Sort
     sort = request.args.get('sort', 'date_added')
-    sort_map = {
-        'date_added': 'date_added DESC',
-        'title':      'LOWER(COALESCE(b.title, (SELECT bf.file_name FROM book_files bf WHERE bf.book_id=b.id LIMIT 1))) ASC',
-        'author':     'LOWER(COALESCE(b.author,"")) ASC, LOWER(COALESCE(b.title,"")) ASC',
-        'year':       'b.publish_year DESC, LOWER(COALESCE(b.title,"")) ASC',
-        'lc':         'COALESCE(b.lc_sort,"ZZZZZZ") ASC',
-        'read':       'b.date_read DESC NULLS LAST',
-        'rating':     'b.rating DESC NULLS LAST, LOWER(COALESCE(b.title,"")) ASC',
-    }
-    order_clause = sort_map.get(sort, 'date_added DESC')
-
-    total = db.execute(f"SELECT COUNT(*) FROM books b {where_clause}", params).fetchone()[0]
-    rows = db.execute(
-        f"""SELECT b.*,
-            (SELECT GROUP_CONCAT(bf.file_ext, ',') FROM book_files bf WHERE bf.book_id=b.id) as formats,
-            (SELECT COUNT(*) FROM book_files bf WHERE bf.book_id=b.id) as file_count,
-            COALESCE(b.primary_file_path,
-                (SELECT bf.file_path FROM book_files bf WHERE bf.book_id=b.id LIMIT 1)) as file_path,
-            (SELECT bf.file_name FROM book_files bf
-             WHERE bf.book_id=b.id AND bf.file_path=COALESCE(b.primary_file_path,bf.file_path)
-             LIMIT 1) as file_name,
-            (SELECT bf.file_ext FROM book_files bf
-             WHERE bf.book_id=b.id AND bf.file_path=COALESCE(b.primary_file_path,bf.file_path)
-             LIMIT 1) as file_ext,
-            (SELECT bf.file_size FROM book_files bf
-             WHERE bf.book_id=b.id AND bf.file_path=COALESCE(b.primary_file_path,bf.file_path)
-             LIMIT 1) as file_size
-        FROM books b {where_clause} ORDER BY {order_clause} LIMIT ? OFFSET ?""",
-        params + [per_page, offset]
-    ).fetchall()
-    
-    return jsonify({
+    order_clause = _BOOK_SORTS.get(sort, _BOOK_SORTS['date_added'])
+    newest_first = order_clause == _BOOK_SORTS['date_added']
+
+    # Keyset paging for the newest-first order: passing the previous page's
+    # next_cursor (after_date_added, after_id) seeks straight to the next rows
+    # on idx_books_date_added instead of walking OFFSET rows, and skips the
+    # COUNT unless count=1 asks for it. A NULL date_added sorts and pages as
+    # ''; both cursor parts are needed, a half cursor falls back to OFFSET
+    after_id = request.args.get('after_id', '')
+    after_date = request.args.get('after_date_added')
+    keyset = newest_first and after_id.isdigit() and after_date is not None
+    total = None
+    if not keyset or request.args.get('count') == '1':
+        total = db.execute(f"SELECT COUNT(*) FROM books b {where_clause}", params).fetchone()[0]
+    page_where, page_params = where_clause, params
+    if keyset:
+        page_where = "WHERE " + " AND ".join(
+            where + ["COALESCE(b.date_added, '') <= ? AND (COALESCE(b.date_added, '') < ? OR b.id < ?)"])
+        page_params = params + [after_date, after_date, int(after_id)]
+        offset = 0
+    books = [dict(r) for r in db.execute(
+        f"SELECT b.* FROM books b {page_where} ORDER BY {order_clause} LIMIT ? OFFSET ?",
+        page_params + [per_page + 1, offset]
+    )]
+    has_more = len(books) > per_page
+    del books[per_page:]
+
+    # File details for this page only, fetched together rather than by six
+    # subqueries per book (which SQLite also ran for every row it sorted):
+    # all formats, and the primary file or else the book's first file
+    files = {}
+    ids = [bk['id'] for bk in books]
+    for n in range(0, len(ids), 500):
+        chunk = ids[n:n + 500]
+        for f in db.execute(
+            "SELECT book_id, file_path, file_name, file_ext, file_size FROM book_files "
+            f"WHERE book_id IN ({','.join('?' * len(chunk))}) ORDER BY book_id, id",
+            chunk
+        ):
+            files.setdefault(f['book_id'], []).append(f)
+    for bk in books:
+        bfs = files.get(bk['id'], [])
+        primary = bk['primary_file_path']
+        main = next((f for f in bfs if primary is None or f['file_path'] == primary), None)
+        exts = [f['file_ext'] for f in bfs if f['file_ext'] is not None]
+        bk['formats'] = ','.join(exts) if exts else None
+        bk['file_count'] = len(bfs)
+        bk['file_path'] = primary if primary is not None else (bfs[0]['file_path'] if bfs else None)
+        bk['file_name'] = main['file_name'] if main else None
+        bk['file_ext'] = main['file_ext'] if main else None
+        bk['file_size'] = main['file_size'] if main else None
+
+    # total is null on cursor pages unless count=1 was passed
+    return _json_response({
         "total": total,
         "page": page,
-        "books": [dict(r) for r in rows]
+        "books": books,
+        "has_more": has_more,
+        "next_cursor": {"after_date_added": books[-1]['date_added'] or '', "after_id": books[-1]['id']}
+                       if newest_first and has_more and books else None,
     })
 
 @app.route('/api/books/<int:book_id>')
 def api_book(book_id):
-    db = get_db()
-    book = db.execute("SELECT * FROM books WHERE id=?", (book_id,)).fetchone()
+    # One cursor for all three reads; each one is an index seek on book id
+    cur = get_db().cursor()
+    book = cur.execute("SELECT * FROM books WHERE id=?", (book_id,)).fetchone()
     if not book:
         return jsonify({"error": "Not found"}), 404
-    candidates = db.execute("SELECT * FROM match_candidates WHERE book_id=?", (book_id,)).fetchall()
-    files = db.execute("SELECT * FROM book_files WHERE book_id=? ORDER BY file_ext", (book_id,)).fetchall()
-    return jsonify({
+    candidates = cur.execute("SELECT * FROM match_candidates WHERE book_id=?", (book_id,)).fetchall()
+    files = cur.execute("SELECT * FROM book_files WHERE book_id=? ORDER BY file_ext", (book_id,)).fetchall()
+    return _json_response({
         "book": dict(book),
         "files": [dict(f) for f in files],
         "candidates": [dict(c) for c in candidates]
@@ -1814,7 +2928,7 @@ def api_apply_match(book_id):
         if not c:
             return jsonify({"error": "Candidate not found"}), 404
         c = dict(c)
-        raw = json.loads(c.get('raw_json', '{}'))
+        raw = _json_loads(c.get('raw_json') or '{}')
         
         # Parse LC if present in raw OpenLibrary data
         lc_raw = ''
@@ -1919,42 +3033,76 @@ def api_lookup(book_id):
     
     candidates = []
     if title_override:
-        # Title override — search both sources, interleave results so both appear
-        gb = query_google_books_title(title_override)
-        ol = query_openlibrary_title(title_override)
+        # Title override — search both sources, interleave results so both appear.
+        # The sources are queried concurrently, so the wait is the slowest one
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            gb = pool.submit(query_google_books_title, title_override)
+            ol = pool.submit(query_openlibrary_title, title_override)
+            by_isbn = pool.submit(query_openlibrary_isbn, isbn_override) if isbn_override else None
+            gb, ol = gb.result(), ol.result()
         # Interleave: GB1, OL1, GB2, OL2, ...
         for i in range(max(len(gb), len(ol))):
             if i < len(gb): candidates.append(gb[i])
             if i < len(ol): candidates.append(ol[i])
-        if isbn_override:
-            candidates += query_openlibrary_isbn(isbn_override)
+        if by_isbn:
+            candidates += by_isbn.result()
     elif isbn13:
-        candidates += query_openlibrary_isbn(isbn13)
-        candidates += query_google_books_isbn(isbn13)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            ol = pool.submit(query_openlibrary_isbn, isbn13)
+            gb = pool.submit(query_google_books_isbn, isbn13)
+            candidates += ol.result()
+            candidates += gb.result()
     else:
         # No ISBN, no title override — fall back to filename
         candidates += query_google_books_title(book.get('file_name', '') or '')
     
     if candidates:
         db.execute("DELETE FROM match_candidates WHERE book_id=?", (book_id,))
-        for c in candidates[:10]:
-            db.execute("""
-                INSERT INTO match_candidates
-                (book_id, source, external_id, title, author, publish_year,
-                 publisher, isbn, cover_url, raw_json)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (book_id, c['source'], c['external_id'], c['title'], c['author'],
-                  c['publish_year'], c['publisher'], c['isbn'], c['cover_url'], c['raw_json']))
+        db.executemany(_CANDIDATE_INSERT_SQL, _candidate_rows(book_id, candidates))
         db.execute("UPDATE books SET match_status='needs_review' WHERE id=?", (book_id,))
         db.commit()
     
     return jsonify({"candidates": candidates})
 
 
+# The slow half of desktop launches runs here — waiting on the launcher, or
+# os.startfile's Explorer hand-off (AV scanning the path) — so it never holds
+# up the request
+_SHELL_POOL = ThreadPoolExecutor(max_workers=4)
+
+def _startfile(target):
+    try:
+        os.startfile(target)
+    except OSError as e:
+        app.logger.error(f"open {target} error: {e}")
+
+def _shell_open(path, reveal=False):
+    """
+    Open path in its default app, or with reveal=True show it in its folder.
+    The launcher is started here, so a missing launcher or target raises to
+    the caller; only the wait is left to _SHELL_POOL.
+    """
+    import subprocess, platform
+    system = platform.system()
+    target = os.path.dirname(path) if reveal else path
+    if system == 'Windows':
+        if reveal and os.path.isfile(path):
+            # Explorer with file selected
+            cmd = ['explorer', '/select,', path]
+        else:
+            if not os.path.exists(target):
+                raise FileNotFoundError(f"Not found: {target}")
+            _SHELL_POOL.submit(_startfile, target)
+            return
+    elif system == 'Darwin':
+        cmd = ['open', target]
+    else:
+        cmd = ['xdg-open', target]
+    _SHELL_POOL.submit(subprocess.Popen(cmd).wait)
+
 @app.route('/api/books/<int:book_id>/open_location', methods=['POST'])
 def api_open_location(book_id):
     """Open the folder containing the book's primary file."""
-    import subprocess, platform
     db = get_db()
     data = request.json or {}
     file_id = data.get('file_id')
@@ -1969,20 +3117,8 @@ def api_open_location(book_id):
                          (book_id,)).fetchone()
     if not row:
         return jsonify({"error": "No file found"}), 404
-    path = row['file_path']
-    folder = os.path.dirname(path)
     try:
-        system = platform.system()
-        if system == 'Windows':
-            # Explorer with file selected
-            if os.path.isfile(path):
-                subprocess.Popen(['explorer', '/select,', path])
-            else:
-                os.startfile(folder)
-        elif system == 'Darwin':
-            subprocess.Popen(['open', folder])
-        else:
-            subprocess.Popen(['xdg-open', folder])
+        _shell_open(row['file_path'], reveal=True)
         return jsonify({"ok": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1990,7 +3126,6 @@ def api_open_location(book_id):
 @app.route('/api/books/<int:book_id>/open', methods=['POST'])
 def api_open_book(book_id):
     """Open a book file. POST {"file_id": N} to open specific format, else opens primary."""
-    import subprocess, platform
     db = get_db()
     data = request.json or {}
     file_id = data.get('file_id')
@@ -2010,13 +3145,7 @@ def api_open_book(book_id):
     if not os.path.isfile(path):
         return jsonify({"error": f"File not found on disk: {path}"}), 404
     try:
-        system = platform.system()
-        if system == 'Windows':
-            os.startfile(path)
-        elif system == 'Darwin':
-            subprocess.Popen(['open', path])
-        else:
-            subprocess.Popen(['xdg-open', path])
+        _shell_open(path)
         return jsonify({"ok": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -2074,9 +3203,25 @@ def api_create_physical():
 
 @app.route('/api/export')
 def api_export():
-    db = get_db()
-    rows = db.execute("SELECT * FROM books ORDER BY author, title").fetchall()
-    return jsonify([dict(r) for r in rows])
+    # Streamed a few hundred rows at a time rather than built as one list,
+    # each row encoded like _json_response(). The generator outlives
+    # the request's get_db() connection, so it reads on its own.
+    def generate():
+        conn = get_db_ro()
+        try:
+            cur = conn.execute("SELECT * FROM books ORDER BY author, title")
+            sep = b'['
+            while True:
+                rows = cur.fetchmany(500)
+                if not rows:
+                    break
+                yield sep + b','.join(_encode_json(dict(r)) for r in rows)
+                sep = b','
+            yield b']' if sep == b',' else b'[]'
+        finally:
+            conn.close()
+
+    return Response(generate(), mimetype='application/json')
 
 
 
@@ -2092,17 +3237,16 @@ def api_delete_with_file(book_id):
         if not os.path.isfile(path):
             continue
         try:
-            if platform.system() == 'Windows':
-                try:
-                    from send2trash import send2trash
-                    send2trash(path)
-                except ImportError:
-                    ps = ('Add-Type -AssemblyName Microsoft.VisualBasic; '
-                          '[Microsoft.VisualBasic.FileIO.FileSystem]::DeleteFile('
-                          f'"{path}",'
-                          '[Microsoft.VisualBasic.FileIO.UIOption]::OnlyErrorDialogs,'
-                          '[Microsoft.VisualBasic.FileIO.RecycleOption]::SendToRecycleBin)')
-                    subprocess.run(['powershell', '-Command', ps], capture_output=True)
+            if SEND2TRASH_AVAILABLE:
+                # Native call on every platform — no helper process per file
+                send2trash(path)
+            elif platform.system() == 'Windows':
+                ps = ('Add-Type -AssemblyName Microsoft.VisualBasic; '
+                      '[Microsoft.VisualBasic.FileIO.FileSystem]::DeleteFile('
+                      f'"{path}",'
+                      '[Microsoft.VisualBasic.FileIO.UIOption]::OnlyErrorDialogs,'
+                      '[Microsoft.VisualBasic.FileIO.RecycleOption]::SendToRecycleBin)')
+                subprocess.run(['powershell', '-Command', ps], capture_output=True)
             elif platform.system() == 'Darwin':
                 subprocess.run(['osascript', '-e',
                     f'tell application "Finder" to delete POSIX file "{path}"'], capture_output=True)
@@ -2138,16 +3282,16 @@ def api_repath_book(book_id):
     if not os.path.isfile(new_path):
         return jsonify({"error": f"File not found: {new_path}"}), 400
     db = get_db()
-    p = Path(new_path)
+    name, ext = os.path.basename(new_path), _file_ext(new_path)
     if file_id:
         db.execute(
             "UPDATE book_files SET file_path=?, file_name=?, file_ext=? WHERE id=? AND book_id=?",
-            (new_path, p.name, p.suffix.lower(), file_id, book_id)
+            (new_path, name, ext, file_id, book_id)
         )
     else:
         db.execute(
             "UPDATE book_files SET file_path=?, file_name=?, file_ext=? WHERE book_id=? LIMIT 1",
-            (new_path, p.name, p.suffix.lower(), book_id)
+            (new_path, name, ext, book_id)
         )
     db.execute("UPDATE books SET date_updated=datetime('now') WHERE id=?", (book_id,))
     db.commit()